@@ -1,12 +1,32 @@
+import os
 import jwt
-import bcrypt
+import time
+import uuid
 import streamlit as st
 from datetime import datetime, timedelta
 import extra_streamlit_components as stx
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
 from .utils import *
-from .exceptions import CredentialsError, ForgotError, RegisterError, ResetError, UpdateError
+from .hasher import Hasher
+from .verifier import password_verifier
+from .revocation import token_revocations
+from .throttle import login_throttle, trusted_proxy_hops
+from .exceptions import CredentialsError, ForgotError, LoginBusyError, LoginThrottledError, RegisterError, ResetError, UpdateError
 from mongo_db.models.users import Users
 
+# Seconds a cookie may vouch for the verified flag before it is re-checked in the database
+revalidate_seconds = int(os.getenv('AUTH_REVALIDATE_SECONDS', 900))
+
+# Rehashes stored passwords to the target cost after a successful login
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rehash')
+
+def _rehash_password(email: str, password: str):
+    try:
+        Users().update_password(email, password)
+    except Exception as e:
+        print(f'Failed to rehash password: {e}')
+
 class Authenticate:
     """
     This class will create login, logout, register user, reset password, forgot password, 
@@ -27,7 +47,9 @@ class Authenticate:
         self.cookie_name = cookie_name
         self.key = key
         self.cookie_expiry_days = cookie_expiry_days
+        # Renders the cookie component, which reads the browser cookies for this run
         self.cookie_manager = stx.CookieManager()
+        self._cookies_fresh = True
 
         if 'name' not in st.session_state:
             st.session_state['name'] = None
@@ -47,9 +69,37 @@ class Authenticate:
         str
             The JWT cookie for passwordless reauthentication.
         """
+        now = time.time()
+        st.session_state['token_id'] = uuid.uuid4().hex
+        st.session_state['token_exp'] = self.exp_date
         return jwt.encode({'name':st.session_state['name'],
             'email':st.session_state['email'],
-            'exp_date':self.exp_date}, self.key, algorithm='HS256')
+            'exp_date':self.exp_date,
+            'verified':bool(st.session_state.get('verified')),
+            'revalidate_at':now + revalidate_seconds,
+            'iat':now,
+            'jti':st.session_state['token_id']}, self.key, algorithm='HS256')
+
+    def _set_cookie(self):
+        """
+        Encodes a fresh reauthentication token and stores it in the browser.
+        """
+        self.token = self._token_encode()
+        self.cookie_manager.set(self.cookie_name, self.token,
+                                expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))
+        st.session_state['auth_cookie'] = self.token
+
+    def load_cookies(self):
+        """
+        Reads the browser cookies through the cookie component. Call once per
+        script run; the component is only rendered while the session has no
+        cached reauthentication cookie, which avoids its extra reruns.
+        """
+        if self._cookies_fresh:
+            self._cookies_fresh = False
+            return
+        if st.session_state.get('auth_cookie') is None:
+            self.cookie_manager.get_all(key='init')
 
     def _token_decode(self) -> str:
         """
@@ -85,24 +135,46 @@ class Authenticate:
         """
         if user is not None:
             hashed_pw = user['password']
-            return bcrypt.checkpw(self.password.encode(), hashed_pw.encode())
+            if password_verifier.verify(self.password, hashed_pw):
+                if Hasher.needs_rehash(hashed_pw):
+                    _rehash_executor.submit(_rehash_password, user['email'], self.password)
+                return True
         return False
 
-    def _check_cookie(self):
+    def _check_cookie(self) -> bool:
         """
         Checks the validity of the reauthentication cookie.
+
+        Returns
+        -------
+        bool
+            True when the cookie was accepted and the session authenticated from it.
+            On every other path self.token is reset to None, so a rejected token
+            can never be re-issued.
         """
         print('Checks the validity of the reauthentication cookie')
-        self.token = self.cookie_manager.get(self.cookie_name)
+        self.token = st.session_state.get('auth_cookie') or self.cookie_manager.get(self.cookie_name)
         if self.token is not None:
-            self.token = self._token_decode()            
-            if self.token is not False:
+            st.session_state['auth_cookie'] = self.token
+            self.token = self._token_decode()
+            if self.token is False or token_revocations.is_revoked(self.token):
+                st.session_state['auth_cookie'] = None
+            else:
                 if st.session_state['logout'] in [None, False]:
                     if self.token['exp_date'] > datetime.utcnow().timestamp():
-                        if 'name' and 'email' in self.token:
+                        if 'name' in self.token and 'email' in self.token:
                             st.session_state['name'] = self.token['name']
                             st.session_state['email'] = self.token['email']
                             st.session_state['authentication_status'] = True
+                            st.session_state['token_id'] = self.token.get('jti')
+                            st.session_state['token_exp'] = self.token['exp_date']
+                            # A recently issued token vouches for the verified flag,
+                            # so no database round trip is needed
+                            if self.token.get('verified') and self.token.get('revalidate_at', 0) > time.time():
+                                st.session_state['verified'] = True
+                            return True
+        self.token = None
+        return False
 
     def _check_email_verified(self) -> bool:
         """
@@ -121,9 +193,9 @@ class Authenticate:
         if not self.email:
             return False
         users = Users()
-        user = users.get_user_by_email(self.email)
-        if user is not None:
-            if 'verified' in user and user['verified']:
+        verified = users.get_verification_by_email(self.email)
+        if verified is not None:
+            if verified:
                 st.session_state['verified'] = True
                 print('user verified!!!')
                 return True
@@ -134,6 +206,27 @@ class Authenticate:
         st.session_state['verified'] = False
         return False
     
+    def _throttle_keys(self) -> list:
+        """
+        Returns the login throttle keys for the current attempt: the email and
+        the client's address (or the session id when it cannot be determined).
+        The address is the X-Forwarded-For entry appended by the trusted proxy,
+        never one supplied by the client.
+        """
+        client = None
+        try:
+            forwarded = st.context.headers.get('X-Forwarded-For')
+            if forwarded and trusted_proxy_hops > 0:
+                entries = [entry.strip() for entry in forwarded.split(',')]
+                if len(entries) >= trusted_proxy_hops:
+                    client = entries[-trusted_proxy_hops] or None
+        except Exception:
+            pass
+        if client is None:
+            ctx = get_script_run_ctx()
+            client = ctx.session_id if ctx else 'unknown'
+        return ['email:' + (self.email or ''), 'client:' + client]
+
     def _check_credentials(self, inplace: bool=True) -> bool:
 
         """
@@ -150,6 +243,9 @@ class Authenticate:
             Validity of entered credentials.
         """
         print('checking credentials....')
+        throttle_keys = self._throttle_keys()
+        # Rejects locked-out emails and clients before any database or bcrypt work
+        login_throttle.check(throttle_keys)
         st.session_state['verified'] = False
         users = Users()
         user = users.get_user_by_email(self.email)
@@ -159,23 +255,26 @@ class Authenticate:
                     print("VERIFIED")
                     st.session_state['verified'] = True                    
                 if self._check_pw(user):
+                    login_throttle.record_success(throttle_keys[:1])
                     if inplace:
                         st.session_state['name'] = user['name']
                         self.exp_date = self._set_exp_date()
-                        self.token = self._token_encode()
-                        self.cookie_manager.set(self.cookie_name, self.token,
-                                                expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))
+                        self._set_cookie()
                         st.session_state['authentication_status'] = True
                     else:
                         return True
                 else:
+                    login_throttle.record_failure(throttle_keys)
                     if inplace:
                         st.session_state['authentication_status'] = False
                     else:
                         return False
+            except LoginBusyError:
+                raise
             except Exception as e:
                 print(e)
         else:
+            login_throttle.record_failure(throttle_keys)
             if inplace:
                 st.session_state['authentication_status'] = False
             else:
@@ -214,7 +313,12 @@ class Authenticate:
             self.password = login_form.text_input('Password', type='password')
             
             if login_form.form_submit_button('Login'):
-                self._check_credentials()
+                try:
+                    self._check_credentials()
+                except (LoginBusyError, LoginThrottledError) as e:
+                    st.error(e.message)
+            # The authenticator lives for the whole session; never keep the plaintext password on it
+            self.password = None
             columns = st.columns((1,1,1))
             if columns[0].button('Forgot password', key="1", use_container_width=True):
                 self.forgot_password('Forgot Password', location)
@@ -228,11 +332,17 @@ class Authenticate:
         if location not in ['main', 'sidebar', 'contact_us', 'home', 'ai_chat', 'ai_assistant', 'ai_photo_editing', 'ai_document_summarize']:
             raise ValueError("Location must be one of 'main' or 'sidebar'")
         if not st.session_state['authentication_status'] or st.session_state.get('verified') in [None, False]:             
-            self._check_cookie()
+            token_accepted = self._check_cookie()
             self.email = st.session_state.get('email')
 
             if st.session_state.get('verified') in [None, False]:
-                email_verified = self._check_email_verified()                
+                email_verified = self._check_email_verified()
+                # Only a token accepted in this run, issued to the signed-in user, is re-issued
+                if (email_verified and token_accepted and st.session_state['authentication_status']
+                        and self.token['email'] == st.session_state.get('email')):
+                    # Re-issue the cookie so the next revalidation window starts now
+                    self.exp_date = self.token['exp_date']
+                    self._set_cookie()
                 return email_verified
             
             return False
@@ -240,7 +350,10 @@ class Authenticate:
     def login_modal(self, email, password):
         self.email = email
         self.password = password
-        self._check_credentials()
+        try:
+            self._check_credentials()
+        finally:
+            self.password = None
 
     def logout(self, button_name: str, location: str='main', key='123'):
         """
@@ -259,14 +372,18 @@ class Authenticate:
             raise ValueError("Location must be one of 'main' or 'sidebar'")
         if location == 'main':
             if st.button(button_name, key=key):
+                self._revoke_session_token()
                 self.cookie_manager.delete(self.cookie_name)
+                st.session_state['auth_cookie'] = None
                 st.session_state['logout'] = True
                 st.session_state['name'] = None
                 st.session_state['email'] = None
                 st.session_state['authentication_status'] = None
                 st.session_state['verified'] = None
         elif location == 'sidebar':
+            self._revoke_session_token()
             self.cookie_manager.delete(self.cookie_name)
+            st.session_state['auth_cookie'] = None
             st.session_state['logout'] = True
             st.session_state['name'] = None
             st.session_state['email'] = None
@@ -274,6 +391,14 @@ class Authenticate:
             st.session_state['verified'] = None
   
 
+    def _revoke_session_token(self):
+        """
+        Adds the session's reauthentication token to the revocation list.
+        """
+        if st.session_state.get('token_id'):
+            token_revocations.revoke_token(st.session_state['token_id'], st.session_state.get('token_exp', 0))
+            st.session_state['token_id'] = None
+
     def _update_password(self, email: str, password: str):
         """
         Updates user's password in the database.
@@ -289,6 +414,11 @@ class Authenticate:
         user = users.get_user_by_email(self.email)
         if user:
             users.update_password(email, password)
+            token_revocations.revoke_user(email, self.cookie_expiry_days * 86400)
+            if st.session_state['authentication_status'] and st.session_state['email'] == email:
+                # Keep the current session signed in with a token issued after the change
+                self.exp_date = self._set_exp_date()
+                self._set_cookie()
 
     def reset_password(self, email: str, form_name: str, location: str='main') -> bool:
         """
@@ -321,14 +451,23 @@ class Authenticate:
         self.password = reset_password_form.text_input('Current password', type='password')
         new_password = reset_password_form.text_input('New password', type='password')
         new_password_repeat = reset_password_form.text_input('Repeat password', type='password')
+        current_password = self.password
+        # The authenticator lives for the whole session; the plaintext password
+        # is only kept on it for the credentials check below
+        self.password = None
         if reset_password_form.form_submit_button('Reset'):
             users = Users()
             user_info = users.get_user_by_email(self.email)
             if user_info is not None:
-                if self._check_credentials(inplace=False):
+                self.password = current_password
+                try:
+                    valid = self._check_credentials(inplace=False)
+                finally:
+                    self.password = None
+                if valid:
                     if len(new_password) > 0:
                         if new_password == new_password_repeat:
-                            if self.password != new_password:
+                            if current_password != new_password:
                                 self._update_password(self.email, new_password)
                                 return self.email
                             else:
@@ -383,7 +522,7 @@ class Authenticate:
         if register_user_form.form_submit_button('Register'):
             if validate_email(new_email):
                 if len(new_email) and len(new_email) and len(new_name) and len(new_password) > 0:
-                    if users.find_one({'email': new_email}) is None:
+                    if not users.email_exists(new_email):
                         if new_password == new_password_repeat:
                             if preauthorization:
                                 if self.preauthorized.find_one({'email': new_email}) is not None:
@@ -440,9 +579,8 @@ class Authenticate:
         if forgot_password_form.form_submit_button('Submit'):
             if len(email) > 0:                
                 users = Users()
-                user = users.get_user_by_email(email)
-                if user is not None:
-                    return email, user['email'], self._set_random_password(email)
+                if users.email_exists(email):
+                    return email, email, self._set_random_password(email)
                 else:
                     return False, None, None
             else:
@@ -465,6 +603,7 @@ class Authenticate:
         self.random_password = generate_random_pw()        
         users = Users()
         users.update_password(email, self.random_password)
+        token_revocations.revoke_user(email, self.cookie_expiry_days * 86400)
         return self.random_password
 
     def update_user_details(self, email: str, form_name: str, location: str='main') -> bool:
@@ -504,9 +643,7 @@ class Authenticate:
                     if field == 'name':
                             st.session_state['name'] = new_value
                             self.exp_date = self._set_exp_date()
-                            self.token = self._token_encode()
-                            self.cookie_manager.set(self.cookie_name, self.token,
-                            expires_at=datetime.now() + timedelta(days=self.cookie_expiry_days))                    
+                            self._set_cookie()
                     return True
                 else:
                     users.disconnect()
@@ -0,0 +1,77 @@
+"""
+Picks the bcrypt cost factor that keeps password verification under a target
+latency on the current machine. Run it on the deployment box and set the
+result as BCRYPT_ROUNDS.
+
+Usage:
+    python -m auth.calibrate [--target-ms 250]
+"""
+import time
+import argparse
+import statistics
+import bcrypt
+
+def time_checkpw(rounds: int, samples: int=5) -> float:
+    """
+    Measures the median bcrypt.checkpw latency for a cost factor.
+
+    Parameters
+    ----------
+    rounds: int
+        The bcrypt cost factor.
+    samples: int
+        The number of verifications to time.
+    Returns
+    -------
+    float
+        The median latency in milliseconds.
+    """
+    password = b'calibration-password'
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.checkpw(password, hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def calibrate_rounds(target_ms: float=250, min_rounds: int=10, max_rounds: int=16, samples: int=5) -> int:
+    """
+    Returns the highest cost factor whose checkpw latency stays under target_ms.
+
+    Parameters
+    ----------
+    target_ms: float
+        The latency budget for a single verification in milliseconds.
+    min_rounds: int
+        The lowest cost factor that will be returned.
+    max_rounds: int
+        The highest cost factor that will be tried.
+    samples: int
+        The number of verifications timed per cost factor.
+    Returns
+    -------
+    int
+        The calibrated cost factor. When even min_rounds exceeds target_ms,
+        min_rounds is returned and a warning is printed.
+    """
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        latency = time_checkpw(rounds, samples)
+        print(f'rounds={rounds}: {latency:.1f} ms')
+        if latency > target_ms:
+            if rounds == min_rounds:
+                print(f'Warning: rounds={min_rounds} already takes {latency:.1f} ms, over the '
+                      f'{target_ms:g} ms target; using it anyway as the lowest allowed cost factor')
+            break
+        best = rounds
+    return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--min-rounds', type=int, default=10)
+    parser.add_argument('--max-rounds', type=int, default=16)
+    args = parser.parse_args()
+    rounds = calibrate_rounds(args.target_ms, args.min_rounds, args.max_rounds)
+    print(f'BCRYPT_ROUNDS={rounds}')
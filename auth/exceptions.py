@@ -55,4 +55,33 @@ class UpdateError(Exception):
     """
     def __init__(self, message: str):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class LoginBusyError(Exception):
+    """
+    Exception raised when too many logins are being verified at once.
+
+    Attributes
+    ----------
+    message: str
+        The custom error message to display.
+    """
+    def __init__(self, message: str='The server is busy verifying other logins, please try again in a moment'):
+        self.message = message
+        super().__init__(self.message)
+
+class LoginThrottledError(Exception):
+    """
+    Exception raised when an email or client has made too many failed login attempts.
+
+    Attributes
+    ----------
+    retry_after: float
+        The number of seconds until the next attempt is allowed.
+    message: str
+        The custom error message to display.
+    """
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        self.message = f'Too many failed login attempts, please try again in {int(retry_after) + 1} seconds'
+        super().__init__(self.message)
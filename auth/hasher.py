@@ -1,10 +1,22 @@
+import os
 import bcrypt
+from concurrent.futures import ProcessPoolExecutor
+
+# Target bcrypt cost for new hashes; pick it with `python -m auth.calibrate`
+default_rounds = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+def _hash_password(password: str, rounds: int=default_rounds) -> str:
+    """
+    Hashes a single plain text password. Module level so it can be sent to
+    worker processes.
+    """
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
 
 class Hasher:
     """
     This class will hash plain text passwords.
     """
-    def __init__(self, passwords: list):
+    def __init__(self, passwords: list, rounds: int=None):
         """
         Create a new instance of "Hasher".
 
@@ -12,8 +24,34 @@ class Hasher:
         ----------
         passwords: list
             The list of plain text passwords to be hashed.
+        rounds: int
+            The bcrypt cost factor (log2 of the number of rounds), defaults to BCRYPT_ROUNDS.
         """
         self.passwords = passwords
+        self.rounds = rounds or default_rounds
+
+    @staticmethod
+    def get_rounds(hashed_password: str) -> int:
+        """
+        Reads the cost factor from a bcrypt hash ("$2b$<cost>$<salt+hash>").
+
+        Parameters
+        ----------
+        hashed_password: str
+            The bcrypt hash.
+        Returns
+        -------
+        int
+            The cost factor the hash was generated with.
+        """
+        return int(hashed_password.split('$')[2])
+
+    @staticmethod
+    def needs_rehash(hashed_password: str, rounds: int=None) -> bool:
+        """
+        Checks whether a stored hash was generated with a different cost than the target.
+        """
+        return Hasher.get_rounds(hashed_password) != (rounds or default_rounds)
 
     def _hash(self, password: str) -> str:
         """
@@ -28,7 +66,7 @@ class Hasher:
         str
             The hashed password.
         """
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        return _hash_password(password, self.rounds)
 
     def generate(self) -> list:
         """
@@ -39,4 +77,25 @@ class Hasher:
         list
             The list of hashed passwords.
         """
-        return [self._hash(password) for password in self.passwords]
\ No newline at end of file
+        return [self._hash(password) for password in self.passwords]
+
+    def generate_batch(self, workers: int=None, chunksize: int=1):
+        """
+        Hashes the list of plain text passwords across a process pool.
+        Intended for bulk onboarding and migrations.
+
+        Parameters
+        ----------
+        workers: int
+            The number of worker processes, defaults to the number of cores.
+        chunksize: int
+            The number of passwords sent to a worker at a time.
+        Returns
+        -------
+        generator
+            The hashed passwords, yielded in the same order as the input.
+        """
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_hash_password, self.passwords,
+                                    [self.rounds] * len(self.passwords), chunksize=chunksize)
@@ -0,0 +1,70 @@
+import time
+import threading
+
+class TokenRevocations:
+    """
+    Server-side revocation list for reauthentication cookies. Logging out
+    revokes a single token by id; changing a password revokes every token
+    issued to the user before the change. Entries are dropped once the
+    tokens they cover would have expired anyway.
+    """
+    def __init__(self):
+        self._tokens = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        self._users = {email: (revoked_at, exp) for email, (revoked_at, exp) in self._users.items() if exp > now}
+
+    def revoke_token(self, jti: str, expires_at: float):
+        """
+        Revokes one token.
+
+        Parameters
+        ----------
+        jti: str
+            The id of the token.
+        expires_at: float
+            The token's expiry timestamp in Unix epoch.
+        """
+        with self._lock:
+            self._purge(time.time())
+            self._tokens[jti] = expires_at
+
+    def revoke_user(self, email: str, max_age: float):
+        """
+        Revokes every token issued to the user until now.
+
+        Parameters
+        ----------
+        email: str
+            The email of the user.
+        max_age: float
+            The longest lifetime of a token in seconds.
+        """
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._users[email] = (now, now + max_age)
+
+    def is_revoked(self, token: dict) -> bool:
+        """
+        Checks a decoded token against the revocation list.
+
+        Parameters
+        ----------
+        token: dict
+            The decoded JWT cookie.
+        Returns
+        -------
+        bool
+            True if the token must no longer be accepted.
+        """
+        with self._lock:
+            if token.get('jti') in self._tokens:
+                return True
+            revoked = self._users.get(token.get('email'))
+            return revoked is not None and token.get('iat', 0) <= revoked[0]
+
+token_revocations = TokenRevocations()
@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from .exceptions import LoginThrottledError
+
+class LoginThrottle:
+    """
+    Sliding-window login throttle shared by all sessions. Failed attempts are
+    counted per key (an email or a client identity); a key that exceeds
+    max_failures within the window is locked out, and each repeated lockout
+    doubles in length. Idle keys are dropped so memory stays bounded; keys
+    with an active lockout are never dropped.
+    """
+    def __init__(self, max_failures: int=5, window: float=300, lockout: float=30,
+                 max_lockout: float=3600, max_keys: int=10000):
+        """
+        Create a new instance of "LoginThrottle".
+
+        Parameters
+        ----------
+        max_failures: int
+            The number of failed attempts allowed per key within the window.
+        window: float
+            The length of the sliding window in seconds.
+        lockout: float
+            The length of the first lockout in seconds.
+        max_lockout: float
+            The longest lockout in seconds.
+        max_keys: int
+            The maximum number of keys tracked; the least recently used keys without
+            an active lockout are dropped first.
+        """
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_cleanup = time.monotonic()
+
+    def _cleanup(self, now: float):
+        """
+        Drops keys with no failures in the window and no active lockout.
+        """
+        if now - self._last_cleanup < self.window:
+            return
+        self._last_cleanup = now
+        for key in list(self._keys):
+            failures, locked_until, _ = self._keys[key]
+            if locked_until <= now and (not failures or failures[-1] <= now - self.window):
+                del self._keys[key]
+
+    def check(self, keys: list):
+        """
+        Raises if any of the keys is locked out. Call before doing any database
+        or password work.
+
+        Parameters
+        ----------
+        keys: list
+            The throttle keys of the attempt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._cleanup(now)
+            retry_after = 0
+            for key in keys:
+                entry = self._keys.get(key)
+                if entry is not None:
+                    retry_after = max(retry_after, entry[1] - now)
+        if retry_after > 0:
+            raise LoginThrottledError(retry_after)
+
+    def record_failure(self, keys: list):
+        """
+        Records a failed attempt and locks out keys over the limit.
+
+        Parameters
+        ----------
+        keys: list
+            The throttle keys of the attempt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                failures, locked_until, lockouts = self._keys.pop(key, (deque(), 0, 0))
+                failures.append(now)
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if len(failures) >= self.max_failures:
+                    locked_until = now + min(self.lockout * 2 ** lockouts, self.max_lockout)
+                    lockouts += 1
+                    failures.clear()
+                self._keys[key] = (failures, locked_until, lockouts)
+            self._evict(now)
+
+    def _evict(self, now: float):
+        """
+        Drops the least recently used keys that are not locked out until at
+        most max_keys remain. Locked out keys are kept even past the limit.
+        """
+        excess = len(self._keys) - self.max_keys
+        if excess <= 0:
+            return
+        for key in list(self._keys):
+            if self._keys[key][1] <= now:
+                del self._keys[key]
+                excess -= 1
+                if not excess:
+                    return
+
+    def record_success(self, keys: list):
+        """
+        Clears the failure history of the keys after a successful login.
+        """
+        with self._lock:
+            for key in keys:
+                self._keys.pop(key, None)
+
+# Number of reverse proxies in front of the app; each appends the address it saw to
+# X-Forwarded-For, so the client is the entry this many places from the right.
+# 0 ignores the header, which the client can set to anything.
+trusted_proxy_hops = int(os.getenv('LOGIN_TRUSTED_PROXY_HOPS', 1))
+
+login_throttle = LoginThrottle(int(os.getenv('LOGIN_MAX_FAILURES', 5)),
+                               float(os.getenv('LOGIN_WINDOW_SECONDS', 300)),
+                               float(os.getenv('LOGIN_LOCKOUT_SECONDS', 30)),
+                               float(os.getenv('LOGIN_MAX_LOCKOUT_SECONDS', 3600)))
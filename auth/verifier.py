@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from .exceptions import LoginBusyError
+
+class PasswordVerifier:
+    """
+    Runs bcrypt verification on a bounded worker pool shared by all sessions,
+    so a burst of logins cannot take every core away from the script threads.
+    Attempts beyond the pool and queue capacity fail fast with LoginBusyError.
+    """
+    def __init__(self, workers: int=2, max_queue: int=8, timeout: float=10):
+        """
+        Create a new instance of "PasswordVerifier".
+
+        Parameters
+        ----------
+        workers: int
+            The number of verifications that run at the same time.
+        max_queue: int
+            The number of verifications allowed to wait for a worker.
+        timeout: float
+            The number of seconds a caller waits for its result.
+        """
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='checkpw')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _run(self, password: bytes, hashed_password: bytes, submitted: float) -> bool:
+        wait = time.monotonic() - submitted
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            return bcrypt.checkpw(password, hashed_password)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Checks a plain text password against a bcrypt hash on the worker pool.
+
+        Parameters
+        ----------
+        password: str
+            The plain text password.
+        hashed_password: str
+            The stored bcrypt hash.
+        Returns
+        -------
+        bool
+            The validity of the password.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise LoginBusyError
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(self._run, password.encode(), hashed_password.encode(), time.monotonic())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise LoginBusyError
+
+    def stats(self) -> dict:
+        """
+        Returns the pool metrics.
+
+        Returns
+        -------
+        dict
+            Queue depth, running verifications, completed and rejected counts,
+            and average and maximum wait time in seconds.
+        """
+        with self._lock:
+            return {'queued': self._queued, 'running': self._running,
+                    'completed': self.completed, 'rejected': self.rejected,
+                    'avg_wait': self.total_wait / self.completed if self.completed else 0.0,
+                    'max_wait': self.max_wait}
+
+password_verifier = PasswordVerifier(int(os.getenv('AUTH_VERIFY_WORKERS', 2)),
+                                     int(os.getenv('AUTH_VERIFY_MAX_QUEUE', 8)),
+                                     float(os.getenv('AUTH_VERIFY_TIMEOUT_SECONDS', 10)))
@@ -0,0 +1,34 @@
+"""
+Measures batch password hashing throughput (hashes/sec) against the number
+of worker processes.
+
+Usage:
+    python -m benchmarks.bench_hasher [--passwords 64] [--rounds 10]
+"""
+import os
+import time
+import argparse
+from auth.hasher import Hasher
+
+def run(passwords: int, rounds: int):
+    hasher = Hasher([f'password-{i}' for i in range(passwords)], rounds)
+
+    start = time.perf_counter()
+    hasher.generate()
+    serial = passwords / (time.perf_counter() - start)
+    print(f'{"serial":>8}: {serial:8.1f} hashes/sec')
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        list(hasher.generate_batch(workers))
+        rate = passwords / (time.perf_counter() - start)
+        print(f'{workers:>8}: {rate:8.1f} hashes/sec ({rate / serial:.2f}x)')
+        workers *= 2
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--passwords', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+    run(args.passwords, args.rounds)
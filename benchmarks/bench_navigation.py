@@ -0,0 +1,60 @@
+"""
+Counts script runs and their wall time for real browser sessions. Starts the
+app with Streamlit's script runner instrumented, so every run is counted,
+including the extra runs triggered by the cookie component, without relying
+on anything in the app itself. It works the same on this commit and on the
+one before it, to compare rebuilding the authenticator on every rerun
+against reusing it.
+
+Sign in, then switch pages in the browser a known number of times and stop
+the server with Ctrl+C; each run is logged as it happens and the totals are
+printed on exit. AppTest cannot be used for this: it does not run the
+cookie component, so it never sees the reruns it causes.
+
+Usage:
+    python -m benchmarks.bench_navigation [--port 8501]
+"""
+import time
+import atexit
+import argparse
+import threading
+from streamlit.web import bootstrap
+from streamlit.runtime.scriptrunner import ScriptRunner
+
+runs = []
+runs_lock = threading.Lock()
+
+def instrument():
+    run_script = ScriptRunner._run_script
+
+    def timed_run_script(self, rerun_data):
+        start = time.perf_counter()
+        try:
+            return run_script(self, rerun_data)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with runs_lock:
+                runs.append(elapsed)
+                count = len(runs)
+            print(f'run {count}: {rerun_data.page_script_hash or "main"} {elapsed:.1f} ms')
+
+    ScriptRunner._run_script = timed_run_script
+
+def report():
+    with runs_lock:
+        if not runs:
+            return
+        print(f'script runs:   {len(runs)}')
+        print(f'wall time/run: {sum(runs) / len(runs):.1f} ms')
+        print(f'total:         {sum(runs):.1f} ms')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8501)
+    args = parser.parse_args()
+
+    flag_options = {'server_port': args.port, 'server_headless': True}
+    bootstrap.load_config_options(flag_options=flag_options)
+    instrument()
+    atexit.register(report)
+    bootstrap.run('home.py', False, [], flag_options)
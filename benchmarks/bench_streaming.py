@@ -0,0 +1,68 @@
+"""
+Compares rendering a streamed 1k-token response once per delta against the
+coalescing StreamRenderer. Reports the websocket payload (serialized Markdown
+protos) and the server CPU time spent building them.
+
+Usage:
+    python -m benchmarks.bench_streaming [--tokens 1000] [--token-ms 20]
+"""
+import time
+import argparse
+from streamlit.proto.Markdown_pb2 import Markdown
+from utils.streaming import StreamRenderer
+
+class ProtoPlaceholder:
+    """
+    Stands in for st.empty(): serializes every render the way it would be sent to the browser.
+    """
+    def __init__(self):
+        self.bytes = 0
+        self.renders = 0
+
+    def markdown(self, body):
+        self.bytes += len(Markdown(body=body).SerializeToString())
+        self.renders += 1
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def deltas(tokens: int):
+    words = ['stream', 'ing ', 'tok', 'ens ', 'are ', 'small', ', ', 'often ', 'one ', 'word\n']
+    return [words[i % len(words)] for i in range(tokens)]
+
+def run(tokens: int, token_ms: float):
+    pieces = deltas(tokens)
+
+    naive = ProtoPlaceholder()
+    start = time.process_time()
+    text = ''
+    for piece in pieces:
+        text += piece
+        naive.markdown(text + '▌')
+    naive.markdown(text)
+    naive_cpu = time.process_time() - start
+
+    coalesced = ProtoPlaceholder()
+    clock = FakeClock()
+    start = time.process_time()
+    renderer = StreamRenderer(coalesced, clock=clock)
+    for piece in pieces:
+        clock.now += token_ms / 1000
+        renderer.add(piece)
+    renderer.finish()
+    coalesced_cpu = time.process_time() - start
+
+    print(f'{"":>10} {"renders":>8} {"KB sent":>10} {"CPU ms":>8}')
+    print(f'{"per delta":>10} {naive.renders:>8} {naive.bytes / 1024:>10.1f} {naive_cpu * 1000:>8.1f}')
+    print(f'{"coalesced":>10} {coalesced.renders:>8} {coalesced.bytes / 1024:>10.1f} {coalesced_cpu * 1000:>8.1f}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=1000)
+    parser.add_argument('--token-ms', type=float, default=20, help='simulated time between deltas')
+    args = parser.parse_args()
+    run(args.tokens, args.token_ms)
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+class UserCache:
+    """
+    Bounded, TTL'd in-process cache of user documents keyed by email.
+    Shared by all sessions in the process; least recently used entries are
+    evicted once max_size is reached.
+    """
+    def __init__(self, max_size: int=1024, ttl: float=300):
+        """
+        Create a new instance of "UserCache".
+
+        Parameters
+        ----------
+        max_size: int
+            The maximum number of user documents kept in memory.
+        ttl: float
+            The number of seconds a cached document stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str, count: bool=True):
+        """
+        Returns a copy of the cached user document, or None on a miss.
+
+        Parameters
+        ----------
+        email: str
+            The email of the user to look up.
+        count: bool
+            Whether the lookup counts towards the hits and misses. Lookups that
+            fall back to a projected query, which is never cached, pass False.
+        Returns
+        -------
+        dict
+            The cached user document or None.
+        """
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += count
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[email]
+                self.evictions += 1
+                self.misses += count
+                return None
+            self._entries.move_to_end(email)
+            self.hits += count
+            return dict(user)
+
+    def set(self, email: str, user: dict):
+        """
+        Stores a copy of the user document.
+
+        Parameters
+        ----------
+        email: str
+            The email of the user.
+        user: dict
+            The user document to cache.
+        """
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, email: str, fields: dict):
+        """
+        Applies a partial update to a cached document, if present.
+
+        Parameters
+        ----------
+        email: str
+            The email of the user.
+        fields: dict
+            The fields that were written to the database.
+        """
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def invalidate(self, email: str):
+        """
+        Drops the cached document for the given email.
+        """
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns
+        -------
+        dict
+            Size, hits, misses and evictions since the process started.
+        """
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+user_cache = UserCache(int(os.getenv('USER_CACHE_MAX_SIZE', 1024)),
+                       float(os.getenv('USER_CACHE_TTL_SECONDS', 300)))
@@ -1,4 +1,5 @@
 import os
+import threading
 from urllib.parse import quote_plus
 from pymongo import MongoClient
 
@@ -11,15 +12,56 @@ mongo_uri = 'mongodb+srv://' + username + ':' + password + '@' + cluster + '/?re
 from_address = os.getenv("YOUR_EMAIL")
 password = os.getenv("YOUR_EMAIL_PASS")
 
+# Connection pool settings for the process-wide client
+max_pool_size = int(os.getenv('MONGO_MAX_POOL_SIZE', 20))
+max_idle_time_ms = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+server_selection_timeout_ms = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+
 class Database:
+    """
+    Hands out a single MongoClient shared by every session in the process.
+    The client is created lazily on first use and keeps its connection pool
+    open across Streamlit reruns.
+    """
+    _client = None
+    _lock = threading.Lock()
 
     def __init__(self) -> None:
         pass
 
+    @classmethod
+    def get_client(cls) -> MongoClient:
+        """
+        Returns the shared MongoClient, creating it on first call.
+
+        Returns
+        -------
+        MongoClient
+            The process-wide MongoClient.
+        """
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = MongoClient(mongo_uri,
+                                              maxPoolSize=max_pool_size,
+                                              maxIdleTimeMS=max_idle_time_ms,
+                                              serverSelectionTimeoutMS=server_selection_timeout_ms)
+        return cls._client
+
     def create_client(self):
-        client = MongoClient(mongo_uri)
-        self.client = client
-        return client[db_name]
-    
+        self.client = self.get_client()
+        return self.client[db_name]
+
     def close_client(self):
-        self.client.close()
\ No newline at end of file
+        # The shared client outlives any single query; use shutdown() to close it.
+        pass
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Closes the shared MongoClient. The next call to get_client() reconnects.
+        """
+        with cls._lock:
+            if cls._client is not None:
+                cls._client.close()
+                cls._client = None
@@ -0,0 +1,76 @@
+from ..connections import Database
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+class Chats:
+    def __init__(self):
+        self.database = Database()
+        db = self.database.create_client()
+        self.conversations = db['chat_conversations']
+        self.messages = db['chat_messages']
+
+    @staticmethod
+    def ensure_indexes(db):
+        """
+        Creates the indexes of the chat collections. Idempotent.
+        """
+        db['chat_messages'].create_index([('email', ASCENDING), ('conversation', ASCENDING), ('seq', ASCENDING)],
+                                         unique=True, name='email_conversation_seq')
+        db['chat_conversations'].create_index([('email', ASCENDING), ('conversation', ASCENDING)],
+                                              unique=True, name='email_conversation')
+        db['chat_conversations'].create_index([('email', ASCENDING), ('kind', ASCENDING), ('updated', DESCENDING)],
+                                              name='email_kind_updated')
+
+    def latest_conversation(self, email, kind):
+        """
+        Returns the most recently updated conversation of the user for the page kind, or None.
+        """
+        return self.conversations.find_one({'email': email, 'kind': kind}, sort=[('updated', DESCENDING)])
+
+    def get_conversation(self, email, conversation):
+        return self.conversations.find_one({'email': email, 'conversation': conversation})
+
+    def append(self, email, conversation, kind, role, content):
+        """
+        Appends a message to a conversation, creating the conversation on the first message.
+        Messages are never rewritten; the next seq is taken from the conversation's counter.
+
+        Returns:
+        dict: The stored message.
+        """
+        now = datetime.now()
+        counter = self.conversations.find_one_and_update(
+            {'email': email, 'conversation': conversation},
+            {'$inc': {'last_seq': 1}, '$set': {'updated': now},
+             '$setOnInsert': {'kind': kind, 'created': now, 'summary': '', 'summarized_seq': 0}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        message = {'email': email, 'conversation': conversation, 'seq': counter['last_seq'],
+                   'role': role, 'content': content, 'created': now}
+        self.messages.insert_one(message)
+        return message
+
+    def get_messages(self, email, conversation, before_seq=None, limit=20):
+        """
+        Returns up to limit messages older than before_seq (the latest ones when None),
+        oldest first, and whether even older messages exist.
+        """
+        query = {'email': email, 'conversation': conversation}
+        if before_seq is not None:
+            query['seq'] = {'$lt': before_seq}
+        messages = list(self.messages.find(query, {'_id': 0, 'seq': 1, 'role': 1, 'content': 1})
+                        .sort('seq', DESCENDING).limit(limit + 1))
+        return messages[:limit][::-1], len(messages) > limit
+
+    def get_messages_after(self, email, conversation, after_seq):
+        """
+        Returns the messages newer than after_seq, oldest first.
+        """
+        return list(self.messages.find({'email': email, 'conversation': conversation, 'seq': {'$gt': after_seq}},
+                                       {'_id': 0, 'seq': 1, 'role': 1, 'content': 1}).sort('seq', ASCENDING))
+
+    def save_context(self, email, conversation, summary, summarized_seq):
+        """
+        Stores the running summary of the conversation and the seq of the last message it covers.
+        """
+        self.conversations.update_one({'email': email, 'conversation': conversation},
+                                      {'$set': {'summary': summary, 'summarized_seq': summarized_seq}})
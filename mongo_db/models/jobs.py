@@ -0,0 +1,118 @@
+from ..connections import Database
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from bson import ObjectId
+
+class Jobs:
+    def __init__(self):
+        self.database = Database()
+        db = self.database.create_client()
+        self.jobs = db['jobs']
+
+    @staticmethod
+    def ensure_indexes(db, ttl_days: int=7):
+        """
+        Creates the indexes of the jobs collection. Idempotent.
+        Finished jobs are removed ttl_days after they finish.
+        """
+        jobs = db['jobs']
+        jobs.create_index([('idempotency_key', ASCENDING)], unique=True, name='idempotency_key_unique')
+        jobs.create_index([('status', ASCENDING), ('kind', ASCENDING), ('created', ASCENDING)], name='status_kind_created')
+        jobs.create_index([('finished', ASCENDING)], name='finished_ttl', expireAfterSeconds=ttl_days * 86400)
+
+    def enqueue(self, kind, payload, idempotency_key, email=None):
+        """
+        Adds a job, or returns the existing job with the same idempotency key.
+        A failed job is queued again.
+        """
+        now = datetime.now()
+        job = self.jobs.find_one_and_update(
+            {'idempotency_key': idempotency_key},
+            {'$setOnInsert': {'kind': kind, 'payload': payload, 'email': email, 'status': 'queued',
+                              'attempts': 0, 'progress': None, 'result': None, 'error': None,
+                              'created': now, 'updated': now}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        if job['status'] == 'failed':
+            job = self.jobs.find_one_and_update(
+                {'_id': job['_id'], 'status': 'failed'},
+                {'$set': {'status': 'queued', 'attempts': 0, 'error': None, 'updated': now},
+                 '$unset': {'finished': ''}},
+                return_document=ReturnDocument.AFTER) or self.get_job(job['_id'])
+        return job
+
+    def get_job(self, job_id, projection=None):
+        return self.jobs.find_one({'_id': ObjectId(job_id)}, projection)
+
+    def claim(self, kinds, worker, lease_seconds, max_attempts):
+        """
+        Marks the oldest queued job (or a running job whose lease has expired) as
+        running for this worker and returns it, or None when there is nothing to do.
+        A job whose lease expired on its last attempt is marked failed instead of
+        being retried.
+        """
+        now = datetime.now()
+        self.jobs.update_many(
+            {'kind': {'$in': kinds}, 'status': 'running', 'lease_until': {'$lt': now},
+             'attempts': {'$gte': max_attempts}},
+            {'$set': {'status': 'failed', 'error': 'The job lease expired on its last attempt',
+                      'updated': now, 'finished': now},
+             '$unset': {'worker': '', 'lease_until': ''}})
+        return self.jobs.find_one_and_update(
+            {'kind': {'$in': kinds},
+             '$or': [{'status': 'queued'},
+                     {'status': 'running', 'lease_until': {'$lt': now}, 'attempts': {'$lt': max_attempts}}]},
+            {'$set': {'status': 'running', 'worker': worker, 'updated': now, 'started': now,
+                      'lease_until': now + timedelta(seconds=lease_seconds)},
+             '$inc': {'attempts': 1}},
+            sort=[('created', ASCENDING)], return_document=ReturnDocument.AFTER)
+
+    def extend_leases(self, job_ids, worker, lease_seconds):
+        """
+        Renews the leases of the running jobs this worker still owns.
+        """
+        now = datetime.now()
+        self.jobs.update_many({'_id': {'$in': job_ids}, 'worker': worker, 'status': 'running'},
+                              {'$set': {'lease_until': now + timedelta(seconds=lease_seconds), 'updated': now}})
+
+    def release(self, job_id, worker):
+        """
+        Returns a claimed job that was never started to the queue, without counting the attempt.
+        """
+        self.jobs.update_one({'_id': job_id, 'worker': worker, 'status': 'running'},
+                             {'$set': {'status': 'queued', 'updated': datetime.now()},
+                              '$inc': {'attempts': -1}, '$unset': {'worker': '', 'lease_until': ''}})
+
+    def update_progress(self, job_id, worker, progress):
+        self.jobs.update_one({'_id': job_id, 'worker': worker, 'status': 'running'},
+                             {'$set': {'progress': progress, 'updated': datetime.now()}})
+
+    def complete(self, job_id, worker, result):
+        """
+        Stores the result of a job, unless another worker has taken it over since.
+
+        Returns:
+        bool: Whether this worker still owned the job.
+        """
+        now = datetime.now()
+        updated = self.jobs.update_one({'_id': job_id, 'worker': worker, 'status': 'running'},
+                                       {'$set': {'status': 'done', 'result': result, 'payload': None,
+                                                 'updated': now, 'finished': now},
+                                        '$unset': {'lease_until': ''}})
+        return updated.modified_count == 1
+
+    def fail(self, job_id, worker, error, retry):
+        """
+        Queues a failed job again, or marks it failed, unless another worker has taken it over since.
+
+        Returns:
+        bool: Whether this worker still owned the job.
+        """
+        now = datetime.now()
+        if retry:
+            update = {'$set': {'status': 'queued', 'error': error, 'updated': now},
+                      '$unset': {'worker': '', 'lease_until': ''}}
+        else:
+            update = {'$set': {'status': 'failed', 'error': error, 'updated': now, 'finished': now},
+                      '$unset': {'lease_until': ''}}
+        updated = self.jobs.update_one({'_id': job_id, 'worker': worker, 'status': 'running'}, update)
+        return updated.modified_count == 1
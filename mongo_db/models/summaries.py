@@ -0,0 +1,24 @@
+from ..connections import Database
+from datetime import datetime
+from pymongo import ASCENDING
+
+class Summaries:
+    def __init__(self):
+        self.database = Database()
+        db = self.database.create_client()
+        self.summaries = db['summaries']
+
+    @staticmethod
+    def ensure_indexes(db, ttl_days: int=30):
+        """
+        Expires mirrored summaries that have not been used for ttl_days. Idempotent.
+        """
+        db['summaries'].create_index([('last_used', ASCENDING)], name='last_used_ttl',
+                                     expireAfterSeconds=ttl_days * 86400)
+
+    def get_summary(self, key):
+        summary = self.summaries.find_one_and_update({'_id': key}, {'$set': {'last_used': datetime.now()}})
+        return summary['value'] if summary else None
+
+    def save_summary(self, key, value):
+        self.summaries.update_one({'_id': key}, {'$set': {'value': value, 'last_used': datetime.now()}}, upsert=True)
@@ -1,24 +1,69 @@
 from ..connections import Database
+from ..cache import user_cache
 from auth.hasher import Hasher
 from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 
 class Users:
     def __init__(self, keep_alive=False):
+        # keep_alive is kept for backwards compatibility; the client is shared
+        # by the whole process and is never closed after a query.
         self.database = Database()
         db = self.database.create_client()
         self.users = db['users']
         self.keep_alive = keep_alive
 
+    @staticmethod
+    def ensure_indexes(db):
+        """
+        Creates the indexes of the users collection. Idempotent.
+
+        Parameters
+        ----------
+        db: Database
+            The pymongo database holding the users collection.
+        """
+        users = db['users']
+        try:
+            users.create_index([('email', ASCENDING)], unique=True, name='email_unique')
+        except OperationFailure as e:
+            # Existing duplicate emails must be cleaned up by hand first
+            print(f'Could not create unique email index: {e}')
+        # Lets the verification lookup be answered from the index alone
+        users.create_index([('email', ASCENDING), ('verified', ASCENDING), ('name', ASCENDING)],
+                           name='email_verified_name')
+
     def get_user_by_email(self, email):
-        user = self.users.find_one({'email': email})
-        if self.keep_alive is False:
-            self.database.close_client()
+        user = user_cache.get(email)
+        if user is None:
+            user = self.users.find_one({'email': email})
+            # Unverified users are not cached: verification is flipped outside
+            # this app and must be visible on the next refresh.
+            if user is not None and user.get('verified'):
+                user_cache.set(email, user)
         return user
-    
+
+    def get_verification_by_email(self, email):
+        """
+        Returns the user's verified flag, or None if the user does not exist.
+        """
+        user = user_cache.get(email, count=False)
+        if user is None:
+            user = self.users.find_one({'email': email}, {'_id': 0, 'email': 1, 'verified': 1})
+            if user is None:
+                return None
+        return bool(user.get('verified'))
+
+    def email_exists(self, email):
+        if user_cache.get(email, count=False) is not None:
+            return True
+        return self.users.find_one({'email': email}, {'_id': 0, 'email': 1}) is not None
+
     def update_password(self, email, password):
         hashed_password = Hasher([password]).generate()[0]
         self.users.update_one({"email": email}, {"$set": {"password": hashed_password}})
-        self.database.close_client()
+        user_cache.update(email, {'password': hashed_password})
 
     def create_user(self, email, name, password, postal_code):
         user = {
@@ -30,11 +75,11 @@ class Users:
             'created': datetime.now()
         }
         self.users.insert_one(user)
-        self.database.close_client()
+        user_cache.invalidate(email)
 
     def update_by_key(self, key, value, email):
         self.users.update_one({"email": email}, {"$set": {key: value}})
-        self.database.close_client()
-    
+        user_cache.update(email, {key: value})
+
     def disconnect(self):
-        self.database.close_client()
\ No newline at end of file
+        self.database.close_client()
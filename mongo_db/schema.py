@@ -0,0 +1,42 @@
+import time
+import threading
+from pymongo.errors import PyMongoError
+from .connections import Database
+from .models.users import Users
+from .models.summaries import Summaries
+from .models.jobs import Jobs
+from .models.chats import Chats
+
+_bootstrapped = False
+_retry_at = 0.0
+_lock = threading.Lock()
+# Seconds to wait before trying again when the database could not be reached
+retry_seconds = 60
+
+def bootstrap():
+    """
+    Creates the indexes the models rely on. Safe to call on every rerun:
+    the work is done once per process and create_index is idempotent.
+    When the database cannot be reached the error is logged and the pages
+    still render; the indexes are tried again after retry_seconds.
+    """
+    global _bootstrapped, _retry_at
+    if _bootstrapped or time.monotonic() < _retry_at:
+        return
+    with _lock:
+        if _bootstrapped or time.monotonic() < _retry_at:
+            return
+        try:
+            # Summaries are only stored in Mongo when the summary cache mirrors to it
+            from utils.summary_cache import mirror_to_mongo
+            db = Database().create_client()
+            Users.ensure_indexes(db)
+            if mirror_to_mongo:
+                Summaries.ensure_indexes(db)
+            Jobs.ensure_indexes(db)
+            Chats.ensure_indexes(db)
+        except PyMongoError as e:
+            print(f'Could not create the database indexes: {e}')
+            _retry_at = time.monotonic() + retry_seconds
+            return
+        _bootstrapped = True
@@ -3,6 +3,8 @@ from time import sleep
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit.source_util import get_pages
 from auth import Authenticate
+from mongo_db.schema import bootstrap
+from utils.perf import count_run, timed, log_process_stats
 
 def get_current_page_name():
     ctx = get_script_run_ctx()
@@ -15,11 +17,19 @@ def get_current_page_name():
 
 
 def make_sidebar():
-    # Initialize the authenticator
-    st.session_state['authenticator'] = Authenticate("coolcookiesd267", "keyd3214", 60)
+    # Make sure the collections are indexed (runs once per process)
+    bootstrap()
 
     current_page_name = get_current_page_name()
-    st.session_state['authenticator'].check_authentication(current_page_name)
+    count_run(current_page_name)
+    log_process_stats()
+
+    with timed('make_sidebar.auth'):
+        # The authenticator (and its cookie component) is built once per session
+        if 'authenticator' not in st.session_state:
+            st.session_state['authenticator'] = Authenticate("coolcookiesd267", "keyd3214", 60)
+        st.session_state['authenticator'].load_cookies()
+        st.session_state['authenticator'].check_authentication(current_page_name)
 
     with st.sidebar:
 
@@ -1,11 +1,10 @@
 # Importing required libraries
-import os
-from openai import OpenAI
 import streamlit as st
-import replicate
 from navigation import make_sidebar
-
-os.environ["REPLICATE_API_TOKEN"] = os.environ.get("REPLICATE_API_TOKEN")
+from utils.llm_gateway import get_gateway, hedging
+from utils.streaming import StreamRenderer
+from utils.chat_history import get_chat_history, chat_area
+from utils.perf import record_since_run_start
 
 # Set Streamlit page configuration
 st.set_page_config(page_title="AI Assistant - MicroSaaS", page_icon="📨", layout="centered", initial_sidebar_state="auto", menu_items=None)
@@ -14,9 +13,8 @@ print('Loading Assistant Page...')
 
 make_sidebar()
 
-# Ensuring that the OpenAI model is set in the session state; defaulting to 'gpt-3.5-turbo'
-if "meta-llama" not in st.session_state:
-    st.session_state["meta-llama"] = "meta/meta-llama-3.1-405b-instruct"
+# Shared gateway; the 'assistant' route defaults to meta/meta-llama-3.1-405b-instruct on Replicate
+llm = get_gateway()
 
 
 st.title("Get help from the most powerful AI Assistant 📨")
@@ -27,43 +25,53 @@ html_text = f"""
 
 st.html(html_text)
 
-# Ensuring that there is a message list in the session state for storing conversation history
-if "assistant_messages" not in st.session_state:
-    st.session_state["assistant_messages"] = []
-
-# Displaying each message in the session state using Streamlit's chat message display
-for message in st.session_state["assistant_messages"]:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-# Handling user input through Streamlit's chat input box
-if prompt := st.chat_input("How can I help you today?"):
-    # Appending the user's message to the session state
-    st.session_state["assistant_messages"].append({"role": "user", "content": prompt})
-
-    # Displaying the user's message in the chat interface
-    with st.chat_message("user"):
-        st.markdown(prompt)
-
-    # Preparing to display the assistant's response
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()  # Placeholder for assistant's response
-        full_response = ""  # Initializing a variable to store the full response
-
-        # Generating a response from the OpenAI model
-        for event in replicate.stream(
-            st.session_state["meta-llama"],  # Using the model specified in the session state
-            input={
-                "prompt": prompt,
-                "max_tokens": 1024
-                },  # Passing the user's message as input
-        ):
-            # Updating the response as it is received
-            full_response += (event.data or "")
-            message_placeholder.markdown(full_response + "▌")  # Displaying the response as it's being 'typed'
-
-        # Updating the placeholder with the final response once fully received
-        message_placeholder.markdown(full_response)
-    
-    # Appending the assistant's response to the session's message list
-    st.session_state["assistant_messages"].append({"role": "assistant", "content": full_response})                
\ No newline at end of file
+@chat_area
+def conversation():
+    # The user's latest conversation, stored in Mongo; only its latest page of messages is loaded
+    history = get_chat_history("assistant")
+    if st.button("New conversation"):
+        history.new_conversation()
+
+    # Displaying the loaded messages using Streamlit's chat message display
+    messages = st.container()
+    with messages:
+        history.render()
+
+    # Handling user input through Streamlit's chat input box, kept inside the fragment
+    with st.container():
+        prompt = st.chat_input("How can I help you today?")
+
+    if prompt:
+        with messages:
+            # Storing the user's message in the conversation
+            history.append("user", prompt)
+
+            # Displaying the user's message in the chat interface
+            with st.chat_message("user"):
+                st.markdown(prompt)
+            # Time from the start of the rerun until the message is shown
+            record_since_run_start("ai_assistant.message")
+
+            # Preparing to display the assistant's response
+            with st.chat_message("assistant"):
+                message_placeholder = st.empty()  # Placeholder for assistant's response
+                renderer = StreamRenderer(message_placeholder)  # Coalesces deltas into a few renders
+
+                # Generating a response through the gateway's assistant route
+                request = [{"role": "user", "content": prompt}]  # Passing the user's message as input
+                if hedging:
+                    # A late first token sends a duplicate request to the smaller hedge model
+                    deltas = llm.hedged_stream("assistant", request, hedge_route="assistant_hedge", max_tokens=1024)
+                else:
+                    deltas = llm.stream("assistant", request, max_tokens=1024)
+                for delta in deltas:
+                    # Updating the response as it is received
+                    renderer.add(delta)
+
+                # Updating the placeholder with the final response once fully received
+                full_response = renderer.finish()
+
+            # Storing the assistant's response in the conversation
+            history.append("assistant", full_response)
+
+conversation()
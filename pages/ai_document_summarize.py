@@ -1,18 +1,16 @@
 import streamlit as st
-import os
 import re
-from openai import OpenAI
 from navigation import make_sidebar
 import utils.utils as utils
+from utils.jobs import submit, get_job
+from utils.llm_gateway import get_gateway
+from utils.summarizer import prompts, split_text
+from utils.summary_cache import summary_key, get_cached_summary
 
 # Set Streamlit page configuration
 st.set_page_config(page_title="AI Document Summarize - MicroSaaS", page_icon="📰", layout="centered", initial_sidebar_state="auto", menu_items=None)
 print('Loading AI Document Summarize...')
 
-api_key = os.getenv("OPENAI_API_KEY")
-# Initializing the OpenAI client with API key from Streamlit's secret storage
-client = OpenAI(api_key=api_key)
-
 make_sidebar()
 
 st.title('AI-powered Document Summarization Tool 📰')
@@ -22,60 +20,77 @@ html_text = f"""
 """
 st.html(html_text)
 
-prompts = {'Scientific Article': {
-    'system': 'You work for a scientific journal and are tasked with summarizing the key findings of a research article. Your goal is to provide a concise summary of the article that highlights the main contributions and results. Pay close attention to all details and ensure that the summary captures the essence of the article. Be highly suspect of all data and conclusions.',
-    'user': 'Based of the following document, provide a concise summary of all meaningful aspects of the document. The information you provide should help to determine whether the document is a good fit for publication. Finally, provide commentary on whether you believe this document worthy of publication with this information '
-    },
-    'Medical Blood Examination': {
-        'system': 'You work for a medical clinic and are tasked with summarizing the results of a patient\'s blood examination. Your goal is to provide a concise summary of the patient\'s health status based on the blood test results. Pay close attention to key metrics like cholesterol levels, blood sugar, and other relevant indicators. Be highly suspect of any abnormalities or red flags.',
-        'user': 'Based on the following document, provide a concise summary of all meaningful aspects of the document. The information you provide should help to determine the patient\'s health status based on the blood test results. Finally, provide commentary on whether you believe the patient is in good health with this information '
-    },
-    'Other': {
-        'system': 'You work as detailed reader and are tasked with summarizing the key points of a document. Your goal is to provide a concise summary of the document that captures the main ideas and arguments. Pay close attention to all details and ensure that the summary is accurate and informative. Be highly suspect of any inconsistencies or missing information with this information ',
-        'user': 'Please provide a summary of the document '
-    }}
-
 uploaded_file = st.file_uploader("Upload document (PDF or text)", type=["pdf", "txt"])
 document_type = st.selectbox("Select document type", options=list(prompts.keys()))
 
-def summarize_text(text, doc_type):
-    """
-    Summarizes the provided text by generating an overall summary and section summaries based on the document type.
-
-    Parameters:
-    text (str): The text content to be summarized.
-    doc_type (str): The type of document (e.g., "Scientific Article", "Medical Blood Examination").
-
-    Returns:
-    dict: A dictionary containing the overall summary and summaries for each section.
-    """
-
-    # Generate an overall summary for the entire document
-    overall_summary = client.chat.completions.create(
-        messages=[
-            {'role': 'system', 'content': prompts[doc_type]['system']},
-            {'role': 'user', 'content': prompts[doc_type]['user'] + text},
-        ],
-        model="gpt-4-1106-preview",
-    )
-
-    summaries = {"overall_summary": overall_summary.choices[0].message.content, "section_summaries": []}
-
-    return summaries
-
 if st.button('Summarize'):
         file_type = uploaded_file.name.split('.')[-1].lower()
         if file_type in ['pdf', 'txt']:
-            text = utils.read_pdf(uploaded_file) if file_type == 'pdf' else str(uploaded_file.read(), 'utf-8')
-            summaries = summarize_text(text, document_type)
-            if summaries:
-                st.header("Overall Summary")
-                b64 = utils.export_as_pdf(summaries["overall_summary"])
-                st.markdown(f'<a href="data:application/octet-stream;base64,{b64.decode()}" download="Report.pdf">Download file</a>', unsafe_allow_html=True)
-                st.write(summaries["overall_summary"])  # Display the overall summary            
+            sections = utils.read_pdf_pages(uploaded_file) if file_type == 'pdf' else split_text(str(uploaded_file.read(), 'utf-8'))
+            if sections is None:
+                # read_pdf_pages has already shown the error
+                st.stop()
+            text = '\n'.join(sections)
+            if not text.strip():
+                st.error("No text could be extracted from the document.")
+                st.stop()
+            # Identical text, document type, prompts and summary models reuse the stored summary and PDF
+            key = summary_key(text, document_type, get_gateway().route_models('summary'))
+            cached = get_cached_summary(key)
+            if cached:
+                st.session_state['summary'] = {'result': cached}
             else:
-                st.error("Failed to generate summaries.")
+                # Summarized by the job worker; identical requests share one job, so reruns never repeat it
+                job = submit('summarize', {'sections': sections, 'doc_type': document_type, 'cache_key': key},
+                             key, st.session_state.get('email'))
+                st.session_state['summary'] = {'job_id': str(job['_id'])}
         else:
             st.error("Unsupported file type. Please upload a PDF or text file.")
+
+def summary_pending():
+    summary = st.session_state['summary']
+    return 'result' not in summary and 'error' not in summary
+
+def show_summary():
+    summary = st.session_state['summary']
+    was_pending = summary_pending()
+    job = None
+    if was_pending:
+        job = get_job(summary['job_id'])
+        if job is None:
+            summary['error'] = 'The job was not found'
+        elif job['status'] == 'done':
+            summary['result'] = job['result']
+        elif job['status'] == 'failed':
+            summary['error'] = job['error']
+
+    if 'error' in summary:
+        st.error(f"Failed to generate summaries. {summary['error']}")
+    elif 'result' in summary:
+        summaries, b64 = summary['result']['summaries'], summary['result']['pdf']
+        st.header("Overall Summary")
+        st.markdown(f'<a href="data:application/octet-stream;base64,{b64}" download="Report.pdf">Download file</a>', unsafe_allow_html=True)
+        st.write(summaries["overall_summary"])  # Display the overall summary
+        for i, section_summary in enumerate(summaries["section_summaries"]):
+            with st.expander(f"Part {i + 1}"):
+                st.write(section_summary)
+    else:
+        # Show the overall summary as the worker writes it
+        st.header("Overall Summary")
+        progress = job.get('progress') or {}
+        if progress.get('stage') == 'overall':
+            st.markdown(progress['text'] + "▌")
+        elif progress.get('stage') == 'sections':
+            st.info("Summarizing the document part by part...")
+        else:
+            st.info("Waiting for the summary to start...")
+
+    if was_pending and not summary_pending():
+        # Finished; rerun once so the page stops polling
+        st.rerun()
+
+# The summary is polled from the job queue, so it survives reruns, navigation and reconnects
+if 'summary' in st.session_state:
+    st.fragment(show_summary, run_every=1 if summary_pending() else None)()
 else:
-    st.info("Please upload a document to start summarization.")
\ No newline at end of file
+    st.info("Please upload a document to start summarization.")
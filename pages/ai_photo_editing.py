@@ -1,10 +1,10 @@
-import os
 import streamlit as st
-from PIL import Image
-import requests
-import replicate
-from io import BytesIO
+from datetime import datetime
 from navigation import make_sidebar
+from utils.images import preprocess_image
+from utils.jobs import submit, get_job
+from utils.photo_cache import photo_edit_key, get_cached_edit
+from utils.photo_edit import prompts, model, build_params
 
 # Set Streamlit page configuration
 st.set_page_config(page_title="AI Photo Editing - MicroSaaS", page_icon="📷", layout="centered", initial_sidebar_state="auto", menu_items=None)
@@ -12,8 +12,6 @@ print('Loading AI Photo Editing Page...')
 
 make_sidebar()
 
-os.environ["REPLICATE_API_TOKEN"] = os.environ.get("REPLICATE_API_TOKEN")
-
 st.title('Edit Your Photos with AI 📷')
 html_text = f"""
 <p>Upload your photo and let our AI transform it for you. Our AI model uses the latest in Generative AI technology to generate stunning visual effects and edits to your photos.</p>
@@ -26,52 +24,103 @@ uploaded_files = st.file_uploader("Select a photo",  type = (["jpg", "jpeg", "pn
 
 # The rest of your code remains unchanged.
 
-prompts = {'winter': {'prompt': 'change the season of weather to winter, add snow, snowing, dead plants', 
-                      'negative': 'summer, spring, autumn, fall, colorful plants'},
-           'summer': {'prompt': 'change the season of weather to summer',
-                      'negative': 'winter, spring, autumn, fall, snow, snowing, dead plants'}}
-
 season = st.selectbox("Select a season to change to", options=list(prompts.keys()))
 
 if st.button('Transform') and uploaded_files:
-    c1, c2 = st.columns(2)
-    
-    with c1:
-        for file in uploaded_files:
-            image = Image.open(file)
-            st.image(image, caption='Original')
-            st.download_button(
-                label="Download Original",
-                data=file,
-                file_name="original_image.png",
-                mime="image/png"
-            )
+    params = build_params(season)
+    entries = []
+    for file in uploaded_files:
+        image_bytes = file.getvalue()
+        entry = {'name': file.name, 'type': file.type, 'original': image_bytes}
+        # The same photo with the same parameters returns the stored output without an upstream call
+        key = photo_edit_key(image_bytes, model, params)
+        output = get_cached_edit(key)
+        if output is not None:
+            entry.update(result=output, cached=True)
+        else:
+            # End-to-end time starts here, so preprocessing is included
+            submitted = datetime.now()
+            # Orient, downscale and re-encode before upload; the model does not need the full resolution
+            prepared = preprocess_image(image_bytes)
+            # Identical requests share one job, so reruns and reconnects never submit the work twice
+            job = submit('photo_edit', {'image': prepared['data'], 'extension': prepared['extension'],
+                                        'params': params, 'cache_key': key},
+                         key, st.session_state.get('email'))
+            entry.update(job_id=str(job['_id']), cached=False, submitted=submitted,
+                         original_bytes=prepared['original_bytes'], bytes=prepared['bytes'])
+        entries.append(entry)
+    st.session_state['photo_edits'] = entries
 
-    with c2:
-        for file in uploaded_files:
-            inputs = {
-                'image': file,
-                'prompt': prompts[season]['prompt'],
-                'negative_prompt': prompts[season]['negative'],
-                'num_outputs': 1,
-                'num_inference_steps': 150,
-                'guidance_scale': 10,
-                'image_guidance_scale': 1.3,
-                'scheduler': "K_EULER_ANCESTRAL",
-            }
+def pending(entries):
+    return [entry for entry in entries if 'result' not in entry and 'error' not in entry]
 
-            output_url = replicate.run("timothybrooks/instruct-pix2pix:30c1d0b916a6f8efce20493f5d61ee27491ab2a60437c13c588468b9810ec23f",
-                                        input=inputs)[0]
-            transformed_image = Image.open(BytesIO(requests.get(output_url).content))
-            st.image(transformed_image, caption='Transformed')
+def refresh(entries):
+    """
+    Copies the state of unfinished jobs into the session's entries.
+    """
+    for entry in pending(entries):
+        job = get_job(entry['job_id'])
+        if job is None:
+            entry['error'] = 'The job was not found'
+        elif job['status'] == 'done':
+            entry['result'] = job['result']
+            # A job shared with an earlier identical request is timed from its own creation
+            start = min(entry.get('submitted', job['created']), job['created'])
+            entry['elapsed'] = (job['finished'] - start).total_seconds()
+            entry['queued'] = (job.get('started', job['created']) - job['created']).total_seconds()
+        elif job['status'] == 'failed':
+            entry['error'] = job['error']
+        else:
+            entry['status'] = job['status']
 
-            # Convert the PIL Image to bytes
-            transformed_image_bytes = BytesIO()
-            transformed_image.save(transformed_image_bytes, format='PNG')
+def show_results():
+    entries = st.session_state['photo_edits']
+    had_pending = bool(pending(entries))
+    refresh(entries)
+    finished = len(entries) - len(pending(entries))
+    st.progress(finished / len(entries), text=f"{finished} of {len(entries)} photos transformed")
 
+    for i, entry in enumerate(entries):
+        c1, c2 = st.columns(2)
+        with c1:
+            st.image(entry['original'], caption='Original')
             st.download_button(
-                label="Download Transformed",
-                data=transformed_image_bytes.getvalue(),
-                file_name="transformed_image.png",
-                mime="image/png"
-            )
\ No newline at end of file
+                label="Download Original",
+                data=entry['original'],
+                file_name=entry['name'],
+                mime=entry['type'],
+                key=f"original_{i}"
+            )
+        with c2:
+            if 'error' in entry:
+                # One failed photo does not affect the others
+                st.error(f"Could not transform {entry['name']}: {entry['error']}")
+            elif 'result' in entry:
+                result = entry['result']
+                st.image(result['data'], caption='Transformed')
+                if entry['cached']:
+                    st.caption("Returned from cache")
+                else:
+                    saved = entry['original_bytes'] - entry['bytes']
+                    st.caption(f"Uploaded {entry['bytes'] / 1024:.0f} KB instead of {entry['original_bytes'] / 1024:.0f} KB "
+                               f"({saved / 1024:.0f} KB saved), {entry['elapsed']:.1f}s end to end, "
+                               f"{entry['queued']:.1f}s of it queued")
+                st.download_button(
+                    label="Download Transformed",
+                    data=result['data'],
+                    file_name=f"transformed_image.{result['extension']}",
+                    mime=result['mime'],
+                    key=f"transformed_{i}"
+                )
+            elif entry.get('status') == 'running':
+                st.info("Transforming...")
+            else:
+                st.info("Queued")
+
+    if had_pending and not pending(entries):
+        # Everything has finished; rerun once so the page stops polling
+        st.rerun()
+
+# Results are polled from the job queue, so they survive reruns, navigation and reconnects
+if 'photo_edits' in st.session_state:
+    st.fragment(show_results, run_every=2 if pending(st.session_state['photo_edits']) else None)()
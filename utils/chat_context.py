@@ -0,0 +1,91 @@
+import os
+from utils.tokens import count_tokens
+
+# Prompt tokens allowed for the conversation sent with each turn
+chat_token_budget = int(os.getenv('CHAT_TOKEN_BUDGET', 3000))
+# Longest running summary of older turns, in tokens
+chat_summary_tokens = int(os.getenv('CHAT_SUMMARY_TOKENS', 400))
+
+class ChatContext:
+    """
+    Keeps the prompt of a chat conversation within a token budget. The most
+    recent messages that fit are sent as they are; older messages are rolled
+    up into a compact running summary that is sent as a system message.
+    When the window overflows it is shrunk to low_water of the budget, so the
+    summary is only updated every few turns.
+    """
+    def __init__(self, llm, route: str, token_budget: int=chat_token_budget,
+                 summary_tokens: int=chat_summary_tokens, low_water: float=0.6):
+        """
+        Create a new instance of "ChatContext".
+
+        Parameters:
+        llm (LLMGateway): The gateway used to write the running summary.
+        route (str): The gateway route the conversation is sent to; also used for the summary.
+        token_budget (int): The maximum number of prompt tokens per turn.
+        summary_tokens (int): The maximum length of the running summary.
+        low_water (float): The share of the budget the window is shrunk to on overflow.
+        """
+        self.llm = llm
+        self.route = route
+        # Tokens are counted with the tokenizer of the route's first model
+        self.model = llm.primary_model(route)
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.low_water = low_water
+
+    def message_tokens(self, message: dict) -> int:
+        # Every message carries a few tokens of role and formatting overhead
+        return count_tokens(message["content"], self.model) + 4
+
+    def _window_start(self, messages: list, budget: int, start: int) -> int:
+        """
+        Returns the index of the oldest message from start on such that the
+        messages after it fit in the budget. The latest message is always kept.
+        """
+        used = 0
+        for i in range(len(messages) - 1, start - 1, -1):
+            used += self.message_tokens(messages[i])
+            if used > budget and i < len(messages) - 1:
+                return i + 1
+        return start
+
+    def _summarize(self, summary: str, messages: list) -> str:
+        transcript = '\n'.join(f'{m["role"]}: {m["content"]}' for m in messages)
+        return self.llm.complete(self.route, [
+            {'role': 'system', 'content': 'You maintain a compact running summary of a conversation. '
+             'Keep facts, names, decisions and open questions; drop small talk.'},
+            {'role': 'user', 'content': f'Current summary:\n{summary or "(none)"}\n\n'
+             f'New messages:\n{transcript}\n\nWrite the updated summary.'},
+        ], max_tokens=self.summary_tokens)
+
+    def build(self, messages: list, state: dict) -> list:
+        """
+        Builds the messages to send for the next turn.
+
+        Parameters:
+        messages (list): The full conversation, oldest first.
+        state (dict): The conversation's context state, {"summary": str, "summarized": int};
+            updated in place when older messages are rolled up.
+
+        Returns:
+        list: The prompt messages: the running summary (if any) followed by the recent window.
+        """
+        state.setdefault('summary', '')
+        state.setdefault('summarized', 0)
+        budget = self.token_budget - (count_tokens(state['summary'], self.model) if state['summary'] else 0)
+        if self._window_start(messages, budget, state['summarized']) > state['summarized']:
+            start = self._window_start(messages, int(self.token_budget * self.low_water) - self.summary_tokens,
+                                       state['summarized'])
+            try:
+                state['summary'] = self._summarize(state['summary'], messages[state['summarized']:start])
+            except Exception as e:
+                # Fall back to a plain sliding window
+                print(f'Failed to summarize chat history: {e}')
+            state['summarized'] = start
+
+        prompt = []
+        if state['summary']:
+            prompt.append({"role": "system", "content": "Summary of the earlier conversation:\n" + state['summary']})
+        prompt += [{"role": m["role"], "content": m["content"]} for m in messages[state['summarized']:]]
+        return prompt
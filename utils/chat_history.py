@@ -0,0 +1,136 @@
+import os
+import uuid
+import functools
+import streamlit as st
+from mongo_db.models.chats import Chats
+from utils.perf import mark_run_start
+
+# Messages rendered at once; older pages are loaded on demand
+chat_page_size = int(os.getenv('CHAT_PAGE_SIZE', 20))
+# Set CHAT_FRAGMENT=0 to rerun the whole page on every message, e.g. to compare rerun
+# times: with PERF_TRACE=1 the server log shows ai_chat.message / ai_assistant.message
+# per message for real browser sessions
+chat_fragment = os.getenv('CHAT_FRAGMENT', '1') == '1'
+
+class ChatHistory:
+    """
+    A user's conversation stored in Mongo. Only the latest page of messages is
+    loaded and rendered; older pages are loaded when asked for. For pages that
+    use a ChatContext, the messages not yet rolled up into the running summary
+    are loaded on the first turn and the summary is stored with the conversation.
+    """
+    def __init__(self, email: str, kind: str, page_size: int=chat_page_size):
+        """
+        Create a new instance of "ChatHistory", resuming the user's latest conversation of the kind.
+
+        Parameters:
+        email (str): The user's email.
+        kind (str): The page the conversation belongs to, e.g. 'chat'.
+        page_size (int): The number of messages loaded per page.
+        """
+        self.chats = Chats()
+        self.email = email
+        self.kind = kind
+        self.page_size = page_size
+        conversation = self.chats.latest_conversation(email, kind)
+        if conversation is None:
+            self._reset(uuid.uuid4().hex)
+        else:
+            self.conversation = conversation['conversation']
+            self.summary = conversation.get('summary', '')
+            self.summarized_seq = conversation.get('summarized_seq', 0)
+            self.messages, self.has_older = self.chats.get_messages(email, self.conversation, limit=page_size)
+            self._context = None
+
+    def _reset(self, conversation: str):
+        self.conversation = conversation
+        self.messages, self.has_older = [], False
+        self.summary, self.summarized_seq = '', 0
+        self._context = []
+
+    def new_conversation(self):
+        """
+        Starts an empty conversation; the current one stays stored.
+        """
+        self._reset(uuid.uuid4().hex)
+
+    def load_older(self):
+        """
+        Loads the page of messages before the oldest loaded one.
+        """
+        if not self.messages:
+            return
+        older, self.has_older = self.chats.get_messages(self.email, self.conversation,
+                                                        before_seq=self.messages[0]['seq'], limit=self.page_size)
+        self.messages = older + self.messages
+
+    def append(self, role: str, content: str) -> dict:
+        """
+        Stores a message and adds it to the loaded messages, keeping only the
+        latest page loaded so a long session does not re-render everything.
+        """
+        message = self.chats.append(self.email, self.conversation, self.kind, role, content)
+        message = {'seq': message['seq'], 'role': role, 'content': content}
+        self.messages.append(message)
+        if len(self.messages) > self.page_size:
+            self.messages = self.messages[-self.page_size:]
+            self.has_older = True
+        if self._context is not None:
+            self._context.append(message)
+        return message
+
+    def build_prompt(self, chat_context) -> list:
+        """
+        Builds the prompt of the next turn with a ChatContext, storing the
+        running summary whenever older messages are rolled up into it.
+        """
+        if self._context is None:
+            self._context = self.chats.get_messages_after(self.email, self.conversation, self.summarized_seq)
+        state = {'summary': self.summary, 'summarized': 0}
+        prompt = chat_context.build(self._context, state)
+        if state['summarized']:
+            self.summary = state['summary']
+            self.summarized_seq = self._context[state['summarized'] - 1]['seq']
+            self._context = self._context[state['summarized']:]
+            self.chats.save_context(self.email, self.conversation, self.summary, self.summarized_seq)
+        return prompt
+
+    def render(self):
+        """
+        Renders the loaded messages, with a button to load the older ones.
+        """
+        if self.has_older and st.button('Load older messages', key=f'{self.kind}_load_older'):
+            self.load_older()
+        for message in self.messages:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+
+def get_chat_history(kind: str) -> ChatHistory:
+    """
+    Returns the session's history of the page kind, reloading it when the signed-in user changes.
+    """
+    key = f'{kind}_history'
+    email = st.session_state.get('email')
+    if key not in st.session_state or st.session_state[key].email != email:
+        st.session_state[key] = ChatHistory(email, kind)
+    return st.session_state[key]
+
+def chat_area(func):
+    """
+    Runs the conversation area of a chat page as a fragment, so sending a
+    message reruns only the conversation, not the authentication, sidebar
+    and header of the page. Because make_sidebar is skipped, a sign-out in
+    another run makes the fragment rerun the whole page instead; a revoked
+    cookie is noticed on the next full run.
+    """
+    if not chat_fragment:
+        return func
+
+    @functools.wraps(func)
+    def run():
+        if not st.session_state.get('authentication_status'):
+            st.rerun()
+        # A fragment rerun skips make_sidebar, so it starts its own run timing
+        mark_run_start()
+        func()
+    return st.fragment(run)
@@ -0,0 +1,96 @@
+import os
+import threading
+import httpx
+import requests
+import replicate
+from requests.adapters import HTTPAdapter
+from openai import OpenAI
+
+# HTTP settings shared by the OpenAI and Replicate clients
+max_connections = int(os.getenv('HTTP_MAX_CONNECTIONS', 20))
+max_keepalive_connections = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', 10))
+keepalive_expiry = float(os.getenv('HTTP_KEEPALIVE_EXPIRY_SECONDS', 60))
+connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', 5))
+read_timeout = float(os.getenv('HTTP_READ_TIMEOUT_SECONDS', 120))
+
+class ConnectionMetrics:
+    """
+    Counts requests and newly opened connections of an httpx client, to show
+    how often pooled keep-alive connections are reused.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def _trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions['trace'] = self._trace
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = self.requests - self.connections
+            return {'requests': self.requests, 'connections': self.connections,
+                    'reuse_ratio': reused / self.requests if self.requests else 0.0}
+
+metrics = {'openai': ConnectionMetrics(), 'replicate': ConnectionMetrics()}
+
+_clients = {}
+_lock = threading.Lock()
+
+def _http_settings(name: str) -> dict:
+    return {'limits': httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry),
+            'timeout': httpx.Timeout(read_timeout, connect=connect_timeout),
+            'event_hooks': {'request': [metrics[name].on_request]}}
+
+def get_openai_client() -> OpenAI:
+    """
+    Returns the process-wide OpenAI client, shared by all sessions and reruns.
+    """
+    with _lock:
+        if 'openai' not in _clients:
+            _clients['openai'] = OpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                                        http_client=httpx.Client(**_http_settings('openai')))
+        return _clients['openai']
+
+def get_replicate_client() -> replicate.Client:
+    """
+    Returns the process-wide Replicate client, shared by all sessions and reruns.
+    """
+    with _lock:
+        if 'replicate' not in _clients:
+            settings = _http_settings('replicate')
+            # Replicate wraps its own transport, so the pool limits go on the transport
+            _clients['replicate'] = replicate.Client(api_token=os.getenv("REPLICATE_API_TOKEN"),
+                                                     timeout=settings['timeout'],
+                                                     transport=httpx.HTTPTransport(limits=settings['limits']),
+                                                     event_hooks=settings['event_hooks'])
+        return _clients['replicate']
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide requests session used to download model outputs,
+    with a keep-alive connection pool.
+    """
+    with _lock:
+        if 'http' not in _clients:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_keepalive_connections, pool_maxsize=max_connections)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _clients['http'] = session
+        return _clients['http']
+
+def connection_stats() -> dict:
+    """
+    Returns the connection reuse metrics of each client.
+    """
+    return {name: m.stats() for name, m in metrics.items()}
@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+def content_key(*parts) -> str:
+    """
+    Builds a content-addressed cache key from the given parts.
+
+    Parameters:
+    parts: Strings or bytes that identify the cached value.
+
+    Returns:
+    str: The SHA-256 hex digest of the parts.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Size-bounded LRU cache of byte blobs on local disk, shared by all sessions
+    and by every process using the same directory. Each value is a file named
+    after its key, and its modification time is its last use; the least
+    recently used files are deleted once max_bytes is exceeded.
+    """
+    def __init__(self, directory: str, max_bytes: int=256 * 1024 * 1024, rescan_seconds: float=60):
+        """
+        Create a new instance of "DiskCache".
+
+        Parameters:
+        directory (str): The directory the cached files are stored in.
+        max_bytes (int): The maximum total size of the cached files.
+        rescan_seconds (float): The interval at which the index is reconciled with
+        files written by other processes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+        # Rebuild the LRU order from what previous processes left behind
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        """
+        Rebuilds the index from the files on disk, oldest access first. Other
+        processes (e.g. a job worker) write to the same directory, so the
+        index is reconciled with the disk before evicting and every
+        rescan_seconds; in between, writes only update the index.
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+        self._size = sum(self._entries.values())
+        self._scanned_at = time.monotonic()
+
+    def get(self, key: str):
+        """
+        Returns the cached bytes for the key, or None on a miss.
+        """
+        with self._lock:
+            # Entries written by other processes are not in the index yet, so
+            # a miss in the index falls back to the disk
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = f.read()
+            except OSError:
+                if key in self._entries:
+                    self._size -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._size += len(value) - self._entries.pop(key, 0)
+            self._entries[key] = len(value)
+            self.hits += 1
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return value
+
+    def set(self, key: str, value: bytes):
+        """
+        Stores the bytes under the key and evicts the least recently used entries if needed.
+        """
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        with self._lock:
+            os.replace(tmp_path, path)
+            self._size += len(value) - self._entries.pop(key, 0)
+            self._entries[key] = len(value)
+            if self._size > self.max_bytes or time.monotonic() - self._scanned_at >= self.rescan_seconds:
+                self._scan()
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            while self._size > self.max_bytes:
+                old_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+from PIL import Image, ImageOps
+from utils.clients import get_http_session, connect_timeout, read_timeout
+
+# Settings for photos sent to the image models
+photo_max_edge = int(os.getenv('PHOTO_MAX_EDGE', 1024))
+photo_format = os.getenv('PHOTO_FORMAT', 'JPEG').upper()
+photo_quality = int(os.getenv('PHOTO_QUALITY', 85))
+
+_extensions = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+_mime_extensions = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+
+def preprocess_image(data: bytes, max_edge: int=photo_max_edge, format: str=photo_format,
+                     quality: int=photo_quality) -> dict:
+    """
+    Prepares an uploaded photo for submission: applies the EXIF orientation,
+    downscales it so its longest edge is at most max_edge and re-encodes it.
+    The original bytes are kept when re-encoding would not make them smaller
+    and the photo needed no rotation or resizing.
+
+    Parameters:
+    data (bytes): The uploaded photo.
+    max_edge (int): The maximum width or height in pixels.
+    format (str): The output format, e.g. JPEG or WEBP.
+    quality (int): The encoder quality for lossy formats.
+
+    Returns:
+    dict: {"data": bytes, "extension": str, "original_bytes": int, "bytes": int, "size": (width, height)}
+    """
+    image = Image.open(BytesIO(data))
+    source_format = image.format
+    # exif_transpose returns a copy even when there is nothing to rotate, so
+    # whether the photo changed is read from its EXIF Orientation tag
+    changed = image.getexif().get(0x0112, 1) != 1
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        changed = True
+
+    if format in ('JPEG',) and image.mode not in ('RGB', 'L'):
+        # Flatten transparency onto white; JPEG has no alpha channel
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+
+    output = BytesIO()
+    image.save(output, format=format, quality=quality, optimize=True)
+    encoded = output.getvalue()
+
+    if not changed and len(encoded) >= len(data):
+        encoded = data
+        format = source_format or format
+    return {'data': encoded, 'extension': _extensions.get(format, format.lower()),
+            'original_bytes': len(data), 'bytes': len(encoded), 'size': image.size}
+
+def fetch_image(url: str) -> dict:
+    """
+    Downloads a model output over the pooled HTTP session into a single buffer,
+    without decoding it. The same bytes can be passed to st.image and
+    st.download_button.
+
+    Parameters:
+    url (str): The URL of the image.
+
+    Returns:
+    dict: {"data": bytes, "mime": str, "extension": str}
+    """
+    with get_http_session().get(url, stream=True, timeout=(connect_timeout, read_timeout)) as response:
+        response.raise_for_status()
+        buffer = BytesIO()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer.write(chunk)
+        mime = response.headers.get('Content-Type', 'image/png').split(';')[0].strip()
+    return {'data': buffer.getvalue(), 'mime': mime, 'extension': _mime_extensions.get(mime, 'png')}
@@ -0,0 +1,49 @@
+import utils.utils as utils
+from utils.jobs import handler
+from utils.llm_gateway import get_gateway
+from utils.photo_edit import edit_photo
+from utils.photo_cache import save_edit
+from utils.summarizer import prompts, stream_summary
+from utils.summary_cache import save_summary
+
+@handler('photo_edit')
+def photo_edit(payload, progress):
+    """
+    Payload: {"image": bytes, "extension": str, "params": dict, "cache_key": str}
+    Result: {"data": bytes, "mime": str, "extension": str}
+    """
+    output = edit_photo(payload['image'], payload['extension'], payload['params'])
+    save_edit(payload['cache_key'], output)
+    return output
+
+def export_report(summaries):
+    """
+    Builds the PDF report from the overall summary and the section summaries.
+
+    Returns:
+    bytes: The base64 encoded PDF.
+    """
+    report = summaries["overall_summary"]
+    for i, section_summary in enumerate(summaries["section_summaries"]):
+        report += f"\n\nPart {i + 1}\n{section_summary}"
+    return utils.export_as_pdf(report)
+
+@handler('summarize')
+def summarize(payload, progress):
+    """
+    Payload: {"sections": list, "doc_type": str, "cache_key": str}
+    Result: {"summaries": dict, "pdf": str}
+
+    The overall summary is streamed into the job's progress as it is written.
+    """
+    section_summaries = []
+    overall_summary = ''
+    progress({'stage': 'sections'}, force=True)
+    for delta in stream_summary(get_gateway(), 'summary', prompts[payload['doc_type']],
+                                payload['sections'], section_summaries):
+        overall_summary += delta
+        progress({'stage': 'overall', 'text': overall_summary})
+    summaries = {"overall_summary": overall_summary, "section_summaries": section_summaries}
+    pdf = export_report(summaries)
+    save_summary(payload['cache_key'], summaries, pdf)
+    return {'summaries': summaries, 'pdf': pdf.decode()}
@@ -0,0 +1,195 @@
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mongo_db.models.jobs import Jobs
+
+# Worker settings; JOBS_IN_PROCESS=0 leaves the queue to a separate `python worker.py`
+jobs_concurrency = int(os.getenv('JOBS_CONCURRENCY', 4))
+jobs_in_process = os.getenv('JOBS_IN_PROCESS', '1') == '1'
+jobs_lease_seconds = int(os.getenv('JOBS_LEASE_SECONDS', 900))
+jobs_max_attempts = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+jobs_poll_seconds = float(os.getenv('JOBS_POLL_SECONDS', 1))
+# Per-kind caps on the jobs a worker runs at the same time, within its concurrency
+jobs_kind_limits = {'photo_edit': int(os.getenv('PHOTO_EDIT_PARALLELISM', 4))}
+
+handlers = {}
+
+def handler(kind: str):
+    """
+    Registers a function as the handler of a job kind. The function receives
+    the job payload and a progress callback, and returns the job result.
+    """
+    def register(func):
+        handlers[kind] = func
+        return func
+    return register
+
+def submit(kind: str, payload: dict, idempotency_key: str, email: str=None) -> dict:
+    """
+    Queues a job, or returns the existing job with the same idempotency key,
+    so reruns and reconnects never duplicate upstream work.
+
+    Parameters:
+    kind (str): The registered job kind.
+    payload (dict): The input of the handler.
+    idempotency_key (str): Identifies identical requests.
+    email (str): The user who submitted the job.
+
+    Returns:
+    dict: The job document.
+    """
+    if jobs_in_process:
+        get_local_worker()
+    return Jobs().enqueue(kind, payload, idempotency_key, email)
+
+def get_job(job_id, include_payload: bool=False) -> dict:
+    """
+    Returns the current state of a job.
+    """
+    return Jobs().get_job(job_id, None if include_payload else {'payload': 0})
+
+class JobWorker:
+    """
+    Claims jobs from the queue and runs their handlers on a bounded thread pool.
+    """
+    def __init__(self, kinds: list=None, concurrency: int=jobs_concurrency, lease_seconds: int=jobs_lease_seconds,
+                 max_attempts: int=jobs_max_attempts, poll_seconds: float=jobs_poll_seconds,
+                 kind_limits: dict=None):
+        """
+        Create a new instance of "JobWorker".
+
+        Parameters:
+        kinds (list): The job kinds to run, defaults to every registered kind.
+        concurrency (int): The number of jobs run at the same time.
+        lease_seconds (int): How long a claimed job is reserved before another worker may retry it;
+        the lease is renewed every third of it while the job runs.
+        max_attempts (int): The number of attempts before a job is marked failed.
+        poll_seconds (float): The delay between polls when the queue is empty.
+        kind_limits (dict): The maximum number of running jobs per kind, defaults to jobs_kind_limits.
+        """
+        self.kinds = kinds or list(handlers)
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.kind_limits = jobs_kind_limits if kind_limits is None else kind_limits
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{id(self)}'
+        self._slots = threading.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job')
+        self._stopped = threading.Event()
+        self._running = {}
+        # Ids of the jobs being run, whose leases the heartbeat renews
+        self._leases = set()
+        self._running_lock = threading.Lock()
+
+    def _claimable_kinds(self) -> list:
+        with self._running_lock:
+            return [kind for kind in self.kinds
+                    if self._running.get(kind, 0) < self.kind_limits.get(kind, self.concurrency)]
+
+    def _finished(self, job):
+        with self._running_lock:
+            self._running[job['kind']] -= 1
+            self._leases.discard(job['_id'])
+        self._slots.release()
+
+    def _heartbeat(self):
+        """
+        Renews the leases of the running jobs until the worker is stopped and
+        its last job has finished, so a long job is not retried by another worker.
+        """
+        jobs = Jobs()
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._running_lock:
+                job_ids = list(self._leases)
+            if not job_ids:
+                if self._stopped.is_set():
+                    return
+                continue
+            try:
+                jobs.extend_leases(job_ids, self.name, self.lease_seconds)
+            except Exception as e:
+                print(f'Failed to renew the job leases: {e}')
+
+    def _run(self, job):
+        jobs = Jobs()
+        last_update = [0.0]
+
+        def progress(value, force=False):
+            # Progress writes are throttled to one per poll interval
+            now = time.monotonic()
+            if force or now - last_update[0] >= self.poll_seconds:
+                last_update[0] = now
+                jobs.update_progress(job['_id'], self.name, value)
+
+        try:
+            result = handlers[job['kind']](job['payload'], progress)
+            owned = jobs.complete(job['_id'], self.name, result)
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['kind']}) failed: {e}")
+            owned = jobs.fail(job['_id'], self.name, str(e), retry=job['attempts'] < self.max_attempts)
+        finally:
+            self._finished(job)
+        if not owned:
+            print(f"Job {job['_id']} ({job['kind']}) was taken over by another worker; its outcome was dropped")
+
+    def run(self):
+        """
+        Claims and runs jobs until stop() is called.
+        """
+        jobs = Jobs()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+        while not self._stopped.is_set():
+            self._slots.acquire()
+            kinds = self._claimable_kinds()
+            job = None
+            if kinds and not self._stopped.is_set():
+                try:
+                    job = jobs.claim(kinds, self.name, self.lease_seconds, self.max_attempts)
+                except Exception as e:
+                    print(f'Failed to claim a job: {e}')
+            if job is None:
+                self._slots.release()
+                self._stopped.wait(self.poll_seconds)
+                continue
+            with self._running_lock:
+                self._running[job['kind']] = self._running.get(job['kind'], 0) + 1
+                self._leases.add(job['_id'])
+            try:
+                if self._stopped.is_set():
+                    raise RuntimeError('The worker is stopping')
+                self._executor.submit(self._run, job)
+            except RuntimeError:
+                # stop() was called after the claim; hand the job back instead of
+                # leaving it running until its lease expires
+                jobs.release(job['_id'], self.name)
+                self._finished(job)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name='job-worker', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=True)
+
+_local_worker = None
+_local_worker_lock = threading.Lock()
+
+def get_local_worker() -> JobWorker:
+    """
+    Starts the in-process worker on first use. Used when no separate worker
+    process is deployed (JOBS_IN_PROCESS=1).
+    """
+    global _local_worker
+    with _local_worker_lock:
+        if _local_worker is None:
+            # Importing the handlers registers them
+            import utils.job_handlers
+            _local_worker = JobWorker()
+            _local_worker.start()
+        return _local_worker
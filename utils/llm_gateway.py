@@ -0,0 +1,443 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+
+# Each route lists equivalent models as "provider:model", in order of preference
+default_routes = {
+    'chat': 'openai:gpt-3.5-turbo',
+    'summary': 'openai:gpt-4-1106-preview',
+    'assistant': 'replicate:meta/meta-llama-3.1-405b-instruct',
+    # Smaller model the assistant's hedged requests go to
+    'assistant_hedge': 'replicate:meta/meta-llama-3-70b-instruct',
+}
+# Number of recent requests the latency and error statistics are computed over
+stats_window = int(os.getenv('LLM_STATS_WINDOW', 50))
+# A model whose recent error rate reaches this is skipped until the cooldown has passed
+max_error_rate = float(os.getenv('LLM_MAX_ERROR_RATE', 0.5))
+cooldown_seconds = float(os.getenv('LLM_COOLDOWN_SECONDS', 30))
+# Set LLM_HEDGING=1 to hedge assistant requests whose first token is late
+hedging = os.getenv('LLM_HEDGING', '0') == '1'
+# The hedge fires after this percentile of the model's recent times to first token,
+# clamped to [min, max] seconds; max is also used until the model has any samples
+hedge_percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+hedge_min_seconds = float(os.getenv('LLM_HEDGE_MIN_SECONDS', 1))
+hedge_max_seconds = float(os.getenv('LLM_HEDGE_MAX_SECONDS', 10))
+
+class Cancellation:
+    """
+    Lets the gateway cancel a request that is running on another thread.
+    Providers register how to cancel their upstream work with on_cancel().
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def on_cancel(self, callback):
+        """
+        Registers a callback run once on cancel(), or right away if already cancelled.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        self._run(callback)
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run(callback)
+
+    def _run(self, callback):
+        # Cancelling may be an HTTP call; it must not delay the winning stream
+        def run():
+            try:
+                callback()
+            except Exception as e:
+                print(f'Failed to cancel an LLM request: {e}')
+        threading.Thread(target=run, daemon=True).start()
+
+class OpenAIProvider:
+    """
+    Chat models of the OpenAI API, through the shared pooled client.
+    Providers have one method, stream(model, messages, cancellation=None, **options),
+    which yields the response text piece by piece.
+    """
+    def stream(self, model: str, messages: list, cancellation: Cancellation=None, **options):
+        from utils.clients import get_openai_client
+        stream = get_openai_client().chat.completions.create(model=model, messages=messages, stream=True, **options)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+
+class ReplicateProvider:
+    """
+    Language models hosted on Replicate, through the shared pooled client.
+    These models take a single prompt, so earlier turns are sent as a
+    transcript ending with the assistant's turn; system messages are sent
+    as the system prompt.
+    """
+    def _input(self, messages: list, options: dict) -> dict:
+        system = '\n'.join(m['content'] for m in messages if m['role'] == 'system')
+        turns = [m for m in messages if m['role'] != 'system']
+        if len(turns) == 1 and turns[0]['role'] == 'user':
+            prompt = turns[0]['content']
+        else:
+            prompt = '\n\n'.join(f"{m['role'].capitalize()}: {m['content']}" for m in turns) + '\n\nAssistant:'
+        return {'prompt': prompt, **({'system_prompt': system} if system else {}), **options}
+
+    def stream(self, model: str, messages: list, cancellation: Cancellation=None, **options):
+        # The same calls as replicate.Client.stream, keeping the prediction so it can be cancelled
+        from utils.clients import get_replicate_client
+        client = get_replicate_client()
+        if ':' in model:
+            prediction = client.predictions.create(version=model.split(':', 1)[1],
+                                                   input=self._input(messages, options), stream=True)
+        else:
+            prediction = client.models.predictions.create(model=model, input=self._input(messages, options),
+                                                          stream=True)
+        if cancellation is not None:
+            cancellation.on_cancel(prediction.cancel)
+        finished = False
+        try:
+            for event in prediction.stream():
+                if event.event == event.EventType.ERROR:
+                    raise RuntimeError(f'Replicate prediction failed: {event.data}')
+                if event.event == event.EventType.DONE:
+                    break
+                if event.event == event.EventType.OUTPUT:
+                    yield event.data
+            finished = True
+        finally:
+            if not finished:
+                # Abandoned or failed: stop the prediction so it is not billed to completion
+                try:
+                    prediction.cancel()
+                except Exception as e:
+                    print(f'Failed to cancel Replicate prediction {prediction.id}: {e}')
+
+class ModelStats:
+    """
+    Rolling time-to-first-token and error statistics of a model.
+    """
+    def __init__(self, window: int=stats_window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.last_error = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+
+    def record_error(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.last_error = time.monotonic()
+
+    def percentile(self, p: float):
+        """
+        Returns the p-th percentile (0-100) of the recent times to first token
+        in seconds, or None before the first success.
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self, max_error_rate: float=max_error_rate, cooldown: float=cooldown_seconds) -> bool:
+        # An unhealthy model is tried again once the cooldown has passed
+        return self.error_rate() < max_error_rate or time.monotonic() - self.last_error >= cooldown
+
+    def summary(self) -> dict:
+        return {'requests': len(self.outcomes), 'error_rate': self.error_rate(),
+                'p50': self.percentile(50), 'p95': self.percentile(95)}
+
+class LLMGateway:
+    """
+    Sends chat requests to the fastest healthy model of a route. A route is a
+    list of equivalent (provider, model) pairs; healthy models are tried in
+    order of their median time to first token, and a model that fails before
+    its first token falls back to the next one.
+    """
+    def __init__(self, providers: dict, routes: dict, window: int=stats_window,
+                 max_error_rate: float=max_error_rate, cooldown: float=cooldown_seconds):
+        """
+        Create a new instance of "LLMGateway".
+
+        Parameters:
+        providers (dict): The providers by name, e.g. {"openai": OpenAIProvider()}.
+        routes (dict): The equivalent models of each route, as lists of (provider, model).
+        window (int): The number of recent requests the statistics are computed over.
+        max_error_rate (float): The error rate at which a model is skipped.
+        cooldown (float): Seconds after the last error before a skipped model is tried again.
+        """
+        self.providers = providers
+        self.routes = routes
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self._stats = {}
+        self._hedges = {'requests': 0, 'fired': 0, 'won': 0, 'failovers': 0}
+        self._lock = threading.Lock()
+
+    def model_stats(self, provider: str, model: str) -> ModelStats:
+        with self._lock:
+            if (provider, model) not in self._stats:
+                self._stats[(provider, model)] = ModelStats(self.window)
+            return self._stats[(provider, model)]
+
+    def primary_model(self, route: str) -> str:
+        """
+        Returns the first configured model of a route, e.g. for token counting.
+        """
+        return self.routes[route][0][1]
+
+    def route_models(self, route: str) -> str:
+        """
+        Returns the configured models of a route as "provider:model,...", e.g.
+        to key cached responses on the models that may have produced them.
+        """
+        return ','.join(f'{provider}:{model}' for provider, model in self.routes[route])
+
+    def candidates(self, route: str) -> list:
+        """
+        Returns the (provider, model) pairs of a route in the order they are
+        tried: healthy models by median latency (untried ones first, to get a
+        sample), then unhealthy ones as a last resort.
+        """
+        def order(item):
+            index, (provider, model) = item
+            stats = self.model_stats(provider, model)
+            healthy = stats.healthy(self.max_error_rate, self.cooldown)
+            latency = stats.percentile(50) or 0.0
+            return (not healthy, latency, index)
+        return [target for _, target in sorted(enumerate(self.routes[route]), key=order)]
+
+    def stream_model(self, provider: str, model: str, messages: list, cancellation: Cancellation=None, **options):
+        """
+        Streams a response from one model, recording its statistics. The
+        request is sent and its first token awaited on the first next() call.
+        A request stopped through its cancellation is not counted as an error,
+        nor as a latency sample when it had not answered yet.
+        """
+        stats = self.model_stats(provider, model)
+        start = time.monotonic()
+        first = True
+        try:
+            for delta in self.providers[provider].stream(model, messages, cancellation=cancellation, **options):
+                if first:
+                    stats.record_success(time.monotonic() - start)
+                    first = False
+                yield delta
+            # An empty response still counts as answered, unless the request was
+            # cancelled before its first token: its wait says nothing about the model
+            if first and (cancellation is None or not cancellation.cancelled):
+                stats.record_success(time.monotonic() - start)
+        except Exception:
+            if cancellation is None or not cancellation.cancelled:
+                stats.record_error()
+            raise
+
+    def stream(self, route: str, messages: list, **options):
+        """
+        Streams the response of the fastest healthy model of the route.
+
+        Parameters:
+        route (str): The route name, e.g. 'chat'.
+        messages (list): The chat messages, as {"role", "content"} dicts.
+        **options: Provider options such as max_tokens.
+
+        Yields:
+        str: The next piece of the response.
+        """
+        errors = []
+        for provider, model in self.candidates(route):
+            stream = self.stream_model(provider, model, messages, **options)
+            try:
+                first = next(stream, None)
+            except Exception as e:
+                # Nothing was sent to the caller yet, so the next model can take over
+                print(f'LLM {provider}:{model} failed, falling back: {e}')
+                errors.append(e)
+                continue
+            try:
+                if first is not None:
+                    yield first
+                yield from stream
+            finally:
+                stream.close()
+            return
+        raise RuntimeError(f'All models of route "{route}" failed: {errors}')
+
+    def complete(self, route: str, messages: list, **options) -> str:
+        """
+        Returns the full response of the fastest healthy model of the route.
+        """
+        return ''.join(self.stream(route, messages, **options))
+
+    def hedge_deadline(self, provider: str, model: str, percentile: float=hedge_percentile,
+                       min_seconds: float=hedge_min_seconds, max_seconds: float=hedge_max_seconds) -> float:
+        """
+        Returns how long to wait for the first token of a model before hedging.
+        """
+        latency = self.model_stats(provider, model).percentile(percentile)
+        return max_seconds if latency is None else min(max(latency, min_seconds), max_seconds)
+
+    def _pump(self, index: int, target: tuple, messages: list, options: dict, events: queue.Queue,
+              cancellation: Cancellation):
+        # Runs one request on its own thread, forwarding its deltas until it ends or is cancelled
+        stream = self.stream_model(*target, messages, cancellation=cancellation, **options)
+        try:
+            for delta in stream:
+                if cancellation.cancelled:
+                    return
+                events.put(('delta', index, delta))
+            events.put(('done', index, None))
+        except Exception as e:
+            events.put(('error', index, e))
+        finally:
+            stream.close()
+
+    def hedged_stream(self, route: str, messages: list, hedge_route: str=None, **options):
+        """
+        Streams the response of the route's fastest healthy model. When no
+        first token arrives within hedge_deadline() (or the request fails
+        first), a duplicate request goes to the first model of hedge_route,
+        or to the route's next model. Whichever answers first is streamed;
+        the other is cancelled upstream as soon as the winner is known.
+
+        Parameters:
+        route (str): The route name, e.g. 'assistant'.
+        messages (list): The chat messages, as {"role", "content"} dicts.
+        hedge_route (str): The route of the hedge model, defaults to the same route.
+        **options: Provider options such as max_tokens.
+
+        Yields:
+        str: The next piece of the response.
+        """
+        candidates = self.candidates(route)
+        targets = [candidates[0], self.candidates(hedge_route)[0] if hedge_route else
+                   candidates[1 if len(candidates) > 1 else 0]]
+        events = queue.Queue()
+        cancellations = [Cancellation(), Cancellation()]
+        started, failed, errors = 0, set(), []
+        hedged = False
+
+        def start():
+            nonlocal started
+            threading.Thread(target=self._pump, args=(started, targets[started], messages, options, events,
+                                                      cancellations[started]), daemon=True).start()
+            started += 1
+
+        with self._lock:
+            self._hedges['requests'] += 1
+        start()
+        deadline = time.monotonic() + self.hedge_deadline(*targets[0])
+        winner = None
+        try:
+            while winner is None:
+                timeout = deadline - time.monotonic() if started == 1 else None
+                try:
+                    kind, index, value = events.get(timeout=max(timeout, 0) if timeout is not None else None)
+                except queue.Empty:
+                    kind = None
+                if kind == 'error':
+                    print(f'LLM {targets[index][0]}:{targets[index][1]} failed: {value}')
+                    failed.add(index)
+                    errors.append(value)
+                    if len(failed) == 2:
+                        raise RuntimeError(f'The request and its hedge failed: {errors}')
+                if kind is None:
+                    # The first token is late: send the hedge
+                    hedged = True
+                    with self._lock:
+                        self._hedges['fired'] += 1
+                    start()
+                elif kind == 'error' and started == 1:
+                    # The request failed before its deadline: fail over to the hedge model
+                    with self._lock:
+                        self._hedges['failovers'] += 1
+                    start()
+                elif kind in ('delta', 'done'):
+                    winner = index
+                    if index == 1 and hedged:
+                        with self._lock:
+                            self._hedges['won'] += 1
+                    if started == 2:
+                        cancellations[1 - index].cancel()
+                    if kind == 'delta':
+                        yield value
+                    else:
+                        return
+
+            while True:
+                kind, index, value = events.get()
+                if index != winner:
+                    continue
+                if kind == 'error':
+                    raise value
+                if kind == 'done':
+                    return
+                yield value
+        finally:
+            for cancellation in cancellations:
+                cancellation.cancel()
+
+    def hedge_stats(self) -> dict:
+        """
+        Returns how many hedged requests were made, how many fired a hedge, how
+        many the hedge won, and how many failed over to the hedge model after an
+        early error.
+        """
+        with self._lock:
+            return dict(self._hedges)
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics of every model used so far.
+        """
+        with self._lock:
+            items = list(self._stats.items())
+        return {f'{provider}:{model}': stats.summary() for (provider, model), stats in items}
+
+def parse_route(value: str) -> list:
+    """
+    Parses "provider:model,provider:model" into a list of (provider, model).
+    """
+    return [tuple(target.strip().split(':', 1)) for target in value.split(',') if target.strip()]
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    """
+    Returns the process-wide gateway. The models of each route are read from
+    LLM_ROUTE_<NAME>, e.g. LLM_ROUTE_CHAT="openai:gpt-3.5-turbo,openai:gpt-4o-mini".
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            routes = {name: parse_route(os.getenv(f'LLM_ROUTE_{name.upper()}', value))
+                      for name, value in default_routes.items()}
+            _gateway = LLMGateway({'openai': OpenAIProvider(), 'replicate': ReplicateProvider()}, routes)
+        return _gateway
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import heapq
+import queue
+import atexit
+import smtplib
+import threading
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+
+class MailWorker:
+    """
+    Sends email from a background thread over a kept-alive, authenticated SMTP
+    connection. Messages are queued by the request and sent in batches; failed
+    sends are rescheduled with exponential backoff (without holding up the rest
+    of the queue) and then moved to a dead-letter store. Permanent (5xx)
+    rejections are dead-lettered right away. Point it at a local SMTP stand-in (e.g. `python -m aiosmtpd -n -l
+    localhost:1025` with SMTP_SSL=0) for testing.
+    """
+    def __init__(self, host: str, port: int, username: str=None, password: str=None, use_ssl: bool=True,
+                 batch_size: int=20, max_retries: int=3, backoff: float=1.0, idle_timeout: float=60,
+                 dead_letter_path: str=None, max_dead_letters: int=1000):
+        """
+        Create a new instance of "MailWorker".
+
+        Parameters:
+        host (str): The SMTP server host.
+        port (int): The SMTP server port.
+        username (str): The SMTP login; no login is attempted when empty.
+        password (str): The SMTP password.
+        use_ssl (bool): Connect with SMTP_SSL instead of plain SMTP.
+        batch_size (int): The maximum number of queued messages sent per batch.
+        max_retries (int): The number of retries before a message is dead-lettered.
+        backoff (float): The delay before the first retry in seconds, doubled on each retry.
+        idle_timeout (float): The number of idle seconds after which the connection is closed.
+        dead_letter_path (str): Optional JSON lines file that dead letters are appended to.
+        max_dead_letters (int): The number of dead letters kept in memory.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.dead_letter_path = dead_letter_path
+        self.max_dead_letters = max_dead_letters
+        self.dead_letters = []
+        self.sent = 0
+        self._queue = queue.Queue()
+        # Messages waiting for a retry, as (not_before, sequence, item)
+        self._retries = []
+        self._retry_sequence = 0
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, from_address: str, to_address: str, msg: MIMEMultipart):
+        """
+        Queues a message for delivery and returns immediately.
+        """
+        self._start()
+        self._queue.put((from_address, to_address, msg, 0))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-worker', daemon=True)
+                self._thread.start()
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.username:
+            server.login(self.username, self.password)
+        self._server = server
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except OSError:
+                # smtplib.SMTPException is an OSError too
+                pass
+            self._server = None
+
+    def _send(self, from_address, to_address, msg):
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.sendmail(from_address, to_address, msg.as_string())
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The kept-alive connection went stale; reconnect once and resend
+            self._server = None
+            self._connect()
+            self._server.sendmail(from_address, to_address, msg.as_string())
+
+    def _dead_letter(self, from_address, to_address, msg, error):
+        # Only the envelope is kept: bodies carry secrets such as reset passwords
+        letter = {'from': from_address, 'to': to_address, 'subject': msg['Subject'],
+                  'error': str(error), 'failed_at': datetime.now().isoformat()}
+        print(f"Failed to send email to {to_address}: {error}")
+        self.dead_letters.append(letter)
+        del self.dead_letters[:-self.max_dead_letters]
+        if self.dead_letter_path:
+            with open(self.dead_letter_path, 'a') as f:
+                f.write(json.dumps(letter) + '\n')
+
+    @staticmethod
+    def _is_permanent(error) -> bool:
+        """
+        Returns whether the server rejected the message for good (a 5xx reply),
+        so retrying it cannot succeed.
+        """
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+    def _deliver(self, from_address, to_address, msg, attempt):
+        try:
+            self._send(from_address, to_address, msg)
+            self.sent += 1
+        except Exception as e:
+            if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                # The connection itself may be broken; a rejection leaves it usable
+                self._disconnect()
+            if attempt < self.max_retries and not self._is_permanent(e):
+                self._retry_sequence += 1
+                heapq.heappush(self._retries, (time.monotonic() + self.backoff * 2 ** attempt, self._retry_sequence,
+                                               (from_address, to_address, msg, attempt + 1)))
+            else:
+                self._dead_letter(from_address, to_address, msg, e)
+
+    def _run(self):
+        stopping = False
+        while not (stopping and self._queue.empty() and not self._retries):
+            timeout = self.idle_timeout
+            if self._retries:
+                timeout = max(0, min(timeout, self._retries[0][0] - time.monotonic()))
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Retries whose backoff has passed go out with the batch
+            now = time.monotonic()
+            while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._retries)[2])
+            if not batch:
+                if not self._retries:
+                    self._disconnect()
+                continue
+            for item in batch:
+                if item is None:
+                    stopping = True
+                else:
+                    self._deliver(*item)
+        self._disconnect()
+
+    def stop(self, timeout: float=10):
+        """
+        Sends what is still queued, closes the connection and stops the thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+_mail_worker = None
+_mail_worker_lock = threading.Lock()
+
+def get_mail_worker() -> MailWorker:
+    """
+    Returns the process-wide mail worker, created on first use so that the
+    SMTP settings are read after the .env file has been loaded.
+    """
+    global _mail_worker
+    with _mail_worker_lock:
+        if _mail_worker is None:
+            _mail_worker = MailWorker(os.getenv('SMTP_SERVER', 'mail.privateemail.com'),
+                                      int(os.getenv('SMTP_PORT', 465)),
+                                      os.getenv('YOUR_EMAIL'),
+                                      os.getenv('YOUR_EMAIL_PASS'),
+                                      os.getenv('SMTP_SSL', '1') == '1',
+                                      dead_letter_path=os.getenv('MAIL_DEAD_LETTER_PATH'))
+            atexit.register(_mail_worker.stop)
+        return _mail_worker
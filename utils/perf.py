@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+import streamlit as st
+from contextlib import contextmanager
+
+# Set PERF_TRACE=1 to print every measurement to the server log
+trace = os.getenv('PERF_TRACE', '0') == '1'
+# With PERF_TRACE=1, the process-wide stats are logged at most this often
+stats_interval = float(os.getenv('PERF_STATS_SECONDS', 60))
+
+_stats_logged_at = 0.0
+_stats_lock = threading.Lock()
+
+def _stats() -> dict:
+    if 'perf' not in st.session_state:
+        st.session_state['perf'] = {}
+    return st.session_state['perf']
+
+def count_run(page: str) -> int:
+    """
+    Counts a script run of a page for the current session.
+
+    Parameters:
+    page (str): The name of the page being run.
+
+    Returns:
+    int: The number of runs of the page so far.
+    """
+    runs = _stats().setdefault('runs', {})
+    runs[page] = runs.get(page, 0) + 1
+    mark_run_start()
+    if trace:
+        print(f'[perf] run #{runs[page]} of {page}')
+    return runs[page]
+
+@contextmanager
+def timed(name: str):
+    """
+    Records the wall time of the enclosed block in the session's perf stats.
+
+    Parameters:
+    name (str): The name the timing is recorded under.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, (time.perf_counter() - start) * 1000)
+
+def _record(name: str, elapsed: float):
+    _stats().setdefault('timings', {}).setdefault(name, []).append(elapsed)
+    if trace:
+        print(f'[perf] {name}: {elapsed:.1f} ms')
+
+def mark_run_start():
+    """
+    Marks the start of the current script run, or of a fragment run.
+    Called by count_run for full script runs.
+    """
+    _stats()['run_started'] = time.perf_counter()
+
+def record_since_run_start(name: str) -> float:
+    """
+    Records the wall time from the start of the current run to now.
+
+    Parameters:
+    name (str): The name the timing is recorded under.
+
+    Returns:
+    float: The elapsed time in milliseconds.
+    """
+    elapsed = (time.perf_counter() - _stats().get('run_started', time.perf_counter())) * 1000
+    _record(name, elapsed)
+    return elapsed
+
+def process_stats() -> dict:
+    """
+    Collects the process-wide metrics of the shared pools and caches.
+
+    Returns:
+    dict: The stats of each component, by name.
+    """
+    from auth.verifier import password_verifier
+    from mongo_db.cache import user_cache
+    from utils.clients import connection_stats
+    from utils.llm_gateway import get_gateway
+    from utils.summary_cache import summary_cache
+    from utils.photo_cache import photo_cache
+    gateway = get_gateway()
+    return {'password_verifier': password_verifier.stats(), 'user_cache': user_cache.stats(),
+            'connections': connection_stats(), 'llm_models': gateway.stats(), 'llm_hedges': gateway.hedge_stats(),
+            'summary_cache': summary_cache.stats(), 'photo_cache': photo_cache.stats()}
+
+def log_process_stats():
+    """
+    Prints process_stats() to the server log when PERF_TRACE=1, at most once
+    per PERF_STATS_SECONDS. Cheap to call on every run.
+    """
+    global _stats_logged_at
+    if not trace:
+        return
+    now = time.monotonic()
+    with _stats_lock:
+        if now - _stats_logged_at < stats_interval:
+            return
+        _stats_logged_at = now
+    for name, value in process_stats().items():
+        print(f'[perf] {name}: {value}')
@@ -0,0 +1,38 @@
+import os
+import json
+from utils.disk_cache import DiskCache, content_key
+from utils.images import photo_max_edge, photo_format, photo_quality
+
+photo_cache = DiskCache(os.getenv('PHOTO_CACHE_DIR', '.cache/photos'),
+                        int(os.getenv('PHOTO_CACHE_MAX_MB', 512)) * 1024 * 1024)
+
+def photo_edit_key(image_bytes: bytes, model: str, params: dict) -> str:
+    """
+    Builds the cache key of a photo edit from the uploaded photo, the model
+    version, the prediction parameters (everything but the image) and the
+    preprocessing settings.
+    """
+    settings = json.dumps({'params': params, 'max_edge': photo_max_edge,
+                           'format': photo_format, 'quality': photo_quality}, sort_keys=True)
+    return content_key(image_bytes, model, settings)
+
+def get_cached_edit(key: str):
+    """
+    Returns the cached output for the key, or None on a miss.
+
+    Returns:
+    dict: {"data": bytes, "mime": str, "extension": str}
+    """
+    value = photo_cache.get(key)
+    if value is None:
+        return None
+    header, data = value.split(b'\n', 1)
+    mime, extension = header.decode().split(' ')
+    return {'data': data, 'mime': mime, 'extension': extension}
+
+def save_edit(key: str, output: dict):
+    """
+    Stores a model output, as returned by fetch_image, under the key.
+    """
+    header = f"{output['mime']} {output['extension']}\n".encode()
+    photo_cache.set(key, header + output['data'])
@@ -0,0 +1,42 @@
+from io import BytesIO
+from utils.clients import get_replicate_client
+from utils.images import fetch_image
+
+model = "timothybrooks/instruct-pix2pix:30c1d0b916a6f8efce20493f5d61ee27491ab2a60437c13c588468b9810ec23f"
+
+prompts = {'winter': {'prompt': 'change the season of weather to winter, add snow, snowing, dead plants', 
+                      'negative': 'summer, spring, autumn, fall, colorful plants'},
+           'summer': {'prompt': 'change the season of weather to summer',
+                      'negative': 'winter, spring, autumn, fall, snow, snowing, dead plants'}}
+
+def build_params(season: str) -> dict:
+    """
+    Returns the instruct-pix2pix parameters, except the image, for a season preset.
+    """
+    return {
+        'prompt': prompts[season]['prompt'],
+        'negative_prompt': prompts[season]['negative'],
+        'num_outputs': 1,
+        'num_inference_steps': 150,
+        'guidance_scale': 10,
+        'image_guidance_scale': 1.3,
+        'scheduler': "K_EULER_ANCESTRAL",
+    }
+
+def edit_photo(image_bytes: bytes, extension: str, params: dict) -> dict:
+    """
+    Runs instruct-pix2pix on a preprocessed photo and downloads the result.
+
+    Parameters:
+    image_bytes (bytes): The preprocessed photo.
+    extension (str): The file extension of the photo's format.
+    params (dict): The prediction parameters from build_params.
+
+    Returns:
+    dict: {"data": bytes, "mime": str, "extension": str}, as downloaded
+    """
+    image = BytesIO(image_bytes)
+    image.name = f"input.{extension}"
+    output_url = get_replicate_client().run(model, input={'image': image, **params})[0]
+    # Kept as downloaded: shown and offered for download without decoding or re-encoding
+    return fetch_image(output_url)
@@ -0,0 +1,64 @@
+import os
+import time
+
+# Minimum seconds between two renders of a streamed response
+stream_interval = float(os.getenv('STREAM_RENDER_INTERVAL', 0.1))
+# Pending bytes that force a render before the interval has passed
+stream_max_pending = int(os.getenv('STREAM_RENDER_MAX_PENDING', 512))
+
+class StreamRenderer:
+    """
+    Renders a streamed response into a placeholder, coalescing deltas so the
+    growing text is re-sent at most once per interval (or once max_pending
+    bytes have accumulated) instead of once per token.
+    """
+    def __init__(self, placeholder, interval: float=stream_interval, max_pending: int=stream_max_pending,
+                 cursor: str="▌", clock=time.monotonic):
+        """
+        Create a new instance of "StreamRenderer".
+
+        Parameters:
+        placeholder: The st.empty() placeholder the response is rendered into.
+        interval (float): The minimum number of seconds between renders.
+        max_pending (int): The number of unrendered bytes that force a render.
+        cursor (str): The marker appended while the response is still streaming.
+        clock: The time source, replaceable for benchmarks.
+        """
+        self.placeholder = placeholder
+        self.interval = interval
+        self.max_pending = max_pending
+        self.cursor = cursor
+        self.clock = clock
+        self.text = ""
+        self.renders = 0
+        self.bytes_sent = 0
+        self._pending = 0
+        self._last_render = clock()
+
+    def _render(self, body: str):
+        self.placeholder.markdown(body)
+        self.renders += 1
+        self.bytes_sent += len(body.encode())
+        self._pending = 0
+        self._last_render = self.clock()
+
+    def add(self, delta: str):
+        """
+        Appends a delta and renders if the interval or the pending byte count is reached.
+        """
+        if not delta:
+            return
+        self.text += delta
+        self._pending += len(delta.encode())
+        if self._pending >= self.max_pending or self.clock() - self._last_render >= self.interval:
+            self._render(self.text + self.cursor)
+
+    def finish(self) -> str:
+        """
+        Renders the complete response without the cursor.
+
+        Returns:
+        str: The full response.
+        """
+        self._render(self.text)
+        return self.text
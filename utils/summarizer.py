@@ -0,0 +1,132 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from utils.tokens import count_tokens
+
+# Largest section sent to the model in one request
+chunk_tokens = int(os.getenv('SUMMARY_CHUNK_TOKENS', 6000))
+# Number of section summaries requested at the same time
+summary_workers = int(os.getenv('SUMMARY_WORKERS', 4))
+
+# System and user prompts of each document type
+prompts = {'Scientific Article': {
+    'system': 'You work for a scientific journal and are tasked with summarizing the key findings of a research article. Your goal is to provide a concise summary of the article that highlights the main contributions and results. Pay close attention to all details and ensure that the summary captures the essence of the article. Be highly suspect of all data and conclusions.',
+    'user': 'Based of the following document, provide a concise summary of all meaningful aspects of the document. The information you provide should help to determine whether the document is a good fit for publication. Finally, provide commentary on whether you believe this document worthy of publication with this information '
+    },
+    'Medical Blood Examination': {
+        'system': 'You work for a medical clinic and are tasked with summarizing the results of a patient\'s blood examination. Your goal is to provide a concise summary of the patient\'s health status based on the blood test results. Pay close attention to key metrics like cholesterol levels, blood sugar, and other relevant indicators. Be highly suspect of any abnormalities or red flags.',
+        'user': 'Based on the following document, provide a concise summary of all meaningful aspects of the document. The information you provide should help to determine the patient\'s health status based on the blood test results. Finally, provide commentary on whether you believe the patient is in good health with this information '
+    },
+    'Other': {
+        'system': 'You work as detailed reader and are tasked with summarizing the key points of a document. Your goal is to provide a concise summary of the document that captures the main ideas and arguments. Pay close attention to all details and ensure that the summary is accurate and informative. Be highly suspect of any inconsistencies or missing information with this information ',
+        'user': 'Please provide a summary of the document '
+    }}
+
+def _split_long(text: str, max_tokens: int, model: str) -> list:
+    """
+    Splits a text that is too long for one chunk on paragraph, then line,
+    then character boundaries.
+    """
+    for separator in ('\n\n', '\n'):
+        parts = [part for part in text.split(separator) if part.strip()]
+        if len(parts) > 1:
+            return chunk_sections(parts, max_tokens, model, separator)
+    size = max_tokens * 4
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def chunk_sections(sections: list, max_tokens: int=chunk_tokens, model: str='gpt-4', separator: str='\n') -> list:
+    """
+    Packs consecutive sections (e.g. PDF pages) into chunks of at most max_tokens.
+
+    Parameters:
+    sections (list): The text of each page or section, in order.
+    max_tokens (int): The token budget of a chunk.
+    model (str): The model whose tokenizer is used for counting.
+    separator (str): The string used to join sections within a chunk.
+
+    Returns:
+    list: The chunk texts, in document order.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for section in sections:
+        tokens = count_tokens(section, model)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long(section, max_tokens, model))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(section)
+        current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+def split_text(text: str) -> list:
+    """
+    Splits plain text into sections on blank lines.
+    """
+    return [section for section in re.split(r'\n\s*\n', text) if section.strip()]
+
+def _complete(llm, route: str, system: str, user: str) -> str:
+    return llm.complete(route, [
+        {'role': 'system', 'content': system},
+        {'role': 'user', 'content': user},
+    ])
+
+def _map_chunks(llm, route: str, prompt: dict, chunks: list, workers: int) -> tuple:
+    """
+    Summarizes the chunks concurrently and builds the prompt of the reduce step.
+
+    Returns:
+    tuple: The chunk summaries and the user prompt for the overall summary.
+    """
+    def summarize_chunk(item):
+        index, chunk = item
+        user = (f'The following is part {index + 1} of {len(chunks)} of a document. '
+                'Summarize all meaningful aspects of this part; the part summaries will be combined later.\n\n' + chunk)
+        return _complete(llm, route, prompt['system'], user)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        section_summaries = list(executor.map(summarize_chunk, enumerate(chunks)))
+
+    combined = '\n\n'.join(f'Part {i + 1}:\n{summary}' for i, summary in enumerate(section_summaries))
+    return section_summaries, (prompt['user'] + '\n\nThe document was summarized part by part; '
+                               'base your answer on these part summaries:\n\n' + combined)
+
+def stream_summary(llm, route: str, prompt: dict, sections: list, section_summaries: list,
+                   max_tokens: int=chunk_tokens, workers: int=summary_workers):
+    """
+    Summarizes a document with a map-reduce pipeline: the sections are packed
+    into token-sized chunks, the chunks are summarized concurrently, and the
+    chunk summaries are reduced into the overall summary, which is yielded as
+    it is generated. A document that fits in one chunk is summarized with a
+    single request.
+
+    Parameters:
+    llm (LLMGateway): The gateway the requests are sent through.
+    route (str): The gateway route of the summary models.
+    prompt (dict): The 'system' and 'user' prompts of the document type.
+    sections (list): The text of each page or section, in order.
+    section_summaries (list): Filled with the summaries of each chunk.
+    max_tokens (int): The token budget of a chunk.
+    workers (int): The number of chunk summaries requested at the same time.
+
+    Yields:
+    str: The next piece of the overall summary.
+    """
+    chunks = chunk_sections(sections, max_tokens, llm.primary_model(route))
+    if len(chunks) <= 1:
+        user = prompt['user'] + (chunks[0] if chunks else '')
+    else:
+        summaries, user = _map_chunks(llm, route, prompt, chunks, workers)
+        section_summaries.extend(summaries)
+
+    yield from llm.stream(route, [
+        {'role': 'system', 'content': prompt['system']},
+        {'role': 'user', 'content': user},
+    ])
@@ -0,0 +1,44 @@
+import os
+import json
+from utils.disk_cache import DiskCache, content_key
+
+# Bump when the summarization prompts or output format change
+PROMPT_VERSION = '2'
+
+summary_cache = DiskCache(os.getenv('SUMMARY_CACHE_DIR', '.cache/summaries'),
+                          int(os.getenv('SUMMARY_CACHE_MAX_MB', 256)) * 1024 * 1024)
+
+# Optionally mirror cached summaries to Mongo so they survive redeploys
+mirror_to_mongo = os.getenv('SUMMARY_CACHE_MONGO', '0') == '1'
+
+def summary_key(text: str, doc_type: str, model: str) -> str:
+    """
+    Builds the cache key of a summary from the extracted text, document type,
+    prompt version and model (or the models of the route that summarizes it).
+    """
+    return content_key(text, doc_type, PROMPT_VERSION, model)
+
+def get_cached_summary(key: str):
+    """
+    Returns the cached summaries and PDF for the key, or None on a miss.
+
+    Returns:
+    dict: {"summaries": dict, "pdf": str} where pdf is the base64 encoded report.
+    """
+    value = summary_cache.get(key)
+    if value is None and mirror_to_mongo:
+        from mongo_db.models.summaries import Summaries
+        value = Summaries().get_summary(key)
+        if value is not None:
+            summary_cache.set(key, value)
+    return json.loads(value) if value is not None else None
+
+def save_summary(key: str, summaries: dict, pdf: bytes):
+    """
+    Stores the summaries and the base64 encoded PDF under the key.
+    """
+    value = json.dumps({'summaries': summaries, 'pdf': pdf.decode()}).encode()
+    summary_cache.set(key, value)
+    if mirror_to_mongo:
+        from mongo_db.models.summaries import Summaries
+        Summaries().save_summary(key, value)
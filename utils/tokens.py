@@ -0,0 +1,28 @@
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encodings = {}
+
+def count_tokens(text: str, model: str='gpt-3.5-turbo') -> int:
+    """
+    Counts the tokens in the text locally, without an API call. Uses tiktoken
+    when it is installed and falls back to an estimate of four characters per
+    token otherwise.
+
+    Parameters:
+    text (str): The text to count.
+    model (str): The model whose tokenizer should be used.
+
+    Returns:
+    int: The number of tokens.
+    """
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding('cl100k_base')
+    return len(_encodings[model].encode(text, disallowed_special=()))
@@ -2,7 +2,7 @@ import streamlit as st
 import os
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-import smtplib
+from utils.mailer import get_mail_worker
 import PyPDF2
 from fpdf import FPDF
 import base64
@@ -30,17 +30,13 @@ def reset_password():
 
 def send_email(subject, message, to_address):
     from_address = os.getenv("YOUR_EMAIL")
-    password = os.getenv("YOUR_EMAIL_PASS")
     msg = MIMEMultipart()
     msg['From'] = from_address
     msg['To'] = to_address
     msg['Subject'] = subject
     msg.attach(MIMEText(message, 'plain'))
-    server = smtplib.SMTP_SSL('mail.privateemail.com', 465)
-    server.login(from_address, password)
-    text = msg.as_string()
-    server.sendmail(from_address, to_address, text)
-    server.quit()
+    # Delivered by the background mail worker so the page returns immediately
+    get_mail_worker().enqueue(from_address, to_address, msg)
 
 def forgot_password():
     try:
@@ -49,7 +45,7 @@ def forgot_password():
             subject = 'Your Micro SaaS App New Password'
             message = f'Your new Micro SaaS App password is: {random_password}. Please login and reset your password.'
             send_email(subject, message, email_forgot_password)
-            st.success('New password sent securely')
+            st.success('Your new password is on its way to your email')
         else:
             st.error('Username not found. Register below.')
     except Exception as e:
@@ -63,26 +59,36 @@ def register_new_user():
     except Exception as e:
         st.error(e)
 
-def read_pdf(file):
+def read_pdf_pages(file):
     """
-    Reads a PDF file and extracts the text content.
+    Reads a PDF file and extracts the text content of each page.
 
     Parameters:
     file (UploadedFile): The uploaded PDF file.
 
     Returns:
-    str: Extracted text from the PDF file.
+    list: Extracted text of each page of the PDF file.
     """
     try:
         reader = PyPDF2.PdfReader(file)
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        return [page.extract_text() for page in reader.pages]
     except Exception as e:
         st.error(f"Failed to read PDF file: {e}")
         return None
 
+def read_pdf(file):
+    """
+    Reads a PDF file and extracts the text content.
+
+    Parameters:
+    file (UploadedFile): The uploaded PDF file.
+
+    Returns:
+    str: Extracted text from the PDF file.
+    """
+    pages = read_pdf_pages(file)
+    return ''.join(pages) if pages is not None else None
+
 def export_as_pdf(report_text, filename="report"):
     report_text = report_text.replace('‘', "'").replace('’', "'").replace('“', '"').replace('”', '"')
     pdf = FPDF(format='letter')
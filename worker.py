@@ -0,0 +1,35 @@
+"""
+Runs queued AI jobs (photo edits, document summaries) outside the Streamlit
+server. Deploy it as a separate service and set JOBS_IN_PROCESS=0 on the web
+service so the pages only enqueue.
+
+Usage:
+    python worker.py [--concurrency 4] [--kinds photo_edit,summarize]
+"""
+import argparse
+import signal
+import threading
+from dotenv import load_dotenv
+load_dotenv('.env')
+
+from mongo_db.schema import bootstrap
+from utils.jobs import JobWorker, handlers, jobs_concurrency
+import utils.job_handlers
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=jobs_concurrency)
+    parser.add_argument('--kinds', default=','.join(handlers))
+    args = parser.parse_args()
+
+    bootstrap()
+    worker = JobWorker(args.kinds.split(','), args.concurrency)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    print(f'Worker {worker.name} running {worker.kinds} with concurrency {worker.concurrency}')
+    worker.start()
+    stopping.wait()
+    print('Stopping worker...')
+    worker.stop()